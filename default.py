@@ -18,10 +18,12 @@ sys.path.insert(0, ADDON_PATH)
 
 from resources.lib.ui.keyboard_window import show_zhuyin_keyboard
 
+LOG_PREFIX = "[script.input.zhuyin] "
+
 
 def log(message: str, level: int = xbmc.LOGINFO):
     """記錄日誌"""
-    xbmc.log(f"[script.input.zhuyin] {message}", level)
+    xbmc.log(LOG_PREFIX + message, level)
 
 
 def parse_args() -> dict:
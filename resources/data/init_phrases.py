@@ -1,6 +1,9 @@
 import sqlite3
 import os
 
+# 移除聲調符號用的轉換表（與 phrase_db 的 zhuyin_notone 欄位一致）
+TONE_STRIP_TABLE = str.maketrans('', '', 'ˊˇˋ˙')
+
 # 常用字詞庫（注音 TAB 詞組 TAB 詞頻）
 PHRASES_DATA = """
 ㄉㄜ˙	的	99999
@@ -489,14 +492,15 @@ def create_database(db_path):
             phrase TEXT NOT NULL,
             frequency INTEGER DEFAULT 100,
             length INTEGER,
+            zhuyin_notone TEXT,
             UNIQUE(zhuyin, phrase)
         )
     ''')
     
     # 建立索引
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_zhuyin ON phrases(zhuyin)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_freq ON phrases(frequency DESC)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_length ON phrases(length)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_zhuyin_freq ON phrases(zhuyin, frequency DESC, length ASC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_notone_freq ON phrases(zhuyin_notone, frequency DESC, length ASC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_phrase_cover ON phrases(phrase, length, frequency, zhuyin)')
     
     # 匯入詞組
     count = 0
@@ -513,9 +517,9 @@ def create_database(db_path):
             
             try:
                 cursor.execute('''
-                    INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length)
-                    VALUES (?, ?, ?, ?)
-                ''', (zhuyin, phrase, frequency, len(phrase)))
+                    INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length, zhuyin_notone)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (zhuyin, phrase, frequency, len(phrase), zhuyin.translate(TONE_STRIP_TABLE)))
                 count += 1
             except:
                 pass
@@ -538,9 +542,9 @@ def create_database(db_path):
                     # 頻率遞減
                     freq = max(1, frequency - i * 1000)
                     cursor.execute('''
-                        INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length)
-                        VALUES (?, ?, ?, 1)
-                    ''', (zhuyin, char, freq))
+                        INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length, zhuyin_notone)
+                        VALUES (?, ?, ?, 1, ?)
+                    ''', (zhuyin, char, freq, zhuyin.translate(TONE_STRIP_TABLE)))
                     count += 1
                 except:
                     pass
@@ -557,6 +561,8 @@ def create_database(db_path):
     cursor.execute('SELECT COUNT(*) FROM phrases WHERE length > 1')
     words = cursor.fetchone()[0]
     
+    # 內建詞庫以唯讀方式開啟，必須維持 rollback journal（WAL 需要可寫入的 -shm 檔）
+    cursor.execute('PRAGMA journal_mode = DELETE')
     conn.close()
     
     print(f"詞庫建立完成: {db_path}")
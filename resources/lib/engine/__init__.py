@@ -5,8 +5,8 @@
 
 from .zhuyin_parser import ZhuyinParser, ZhuyinSyllable
 from .candidate_engine import CandidateEngine, SmartCandidateEngine, Candidate
-from .phrase_db import PhraseDatabase, UserPhraseDatabase
-from .learning import LearningEngine
+from .phrase_db import PhraseDatabase, UserPhraseDatabase, get_user_phrase_db
+from .learning import LearningEngine, get_learning_engine
 
 __all__ = [
     'ZhuyinParser',
@@ -17,4 +17,6 @@ __all__ = [
     'PhraseDatabase',
     'UserPhraseDatabase',
     'LearningEngine',
+    'get_user_phrase_db',
+    'get_learning_engine',
 ]
@@ -3,15 +3,32 @@
 候選字引擎 - 管理候選字詞的產生與排序
 """
 
+import heapq
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterator, List, Optional, Tuple
 from .zhuyin_parser import ZhuyinParser, ZhuyinSyllable
-from .phrase_db import PhraseDatabase, UserPhraseDatabase
+from .phrase_db import PhraseDatabase, UserPhraseDatabase, get_user_phrase_db
+
+
+# 排序分數
+_EXACT_SCORE = 10000
+_SOURCE_SCORE = {
+    'learned': 8000,
+    'user': 6000,
+    'system': 4000,
+}
+# 長度分數，以字數為索引（2-4字最佳，超過上限視為長詞）
+_LEN_SCORE = (1000, 3000, 5000, 5000, 5000, 1000)
+_LEN_SCORE_MAX = len(_LEN_SCORE) - 1
 
 
 @dataclass
 class Candidate:
     """候選詞結構"""
+    # 手動宣告 __slots__（dataclass(slots=True) 需要 Python 3.10）
+    __slots__ = ('phrase', 'zhuyin', 'frequency', 'source', 'is_exact')
+    
     phrase: str           # 詞組文字
     zhuyin: str           # 對應注音
     frequency: int        # 詞頻
@@ -22,6 +39,26 @@ class Candidate:
         return self.phrase
 
 
+def _score(phrase: str, frequency: int, source: str, is_exact: bool) -> int:
+    """候選詞分數（越高越前面）"""
+    length = len(phrase)
+    return ((_EXACT_SCORE if is_exact else 0)
+            + _LEN_SCORE[length if length < _LEN_SCORE_MAX else _LEN_SCORE_MAX]
+            + _SOURCE_SCORE.get(source, 0)
+            + frequency)
+
+
+def _sort_key(c: Candidate) -> int:
+    """候選詞排序鍵"""
+    return -_score(c.phrase, c.frequency, c.source, c.is_exact)
+
+
+def _row_sort_key(row: tuple) -> int:
+    """候選資料列排序鍵，欄位順序同 Candidate"""
+    phrase, _, frequency, source, is_exact = row
+    return -_score(phrase, frequency, source, is_exact)
+
+
 class CandidateEngine:
     """候選字引擎"""
     
@@ -32,14 +69,15 @@ class CandidateEngine:
         
         Args:
             phrase_db: 系統詞庫
-            user_db: 用戶詞庫
+            user_db: 用戶詞庫，None 則使用共用的全域實例
         """
         self.parser = ZhuyinParser()
         self.phrase_db = phrase_db or PhraseDatabase()
-        self.user_db = user_db or UserPhraseDatabase()
+        self.user_db = user_db or get_user_phrase_db()
         
-        # 快取最近的查詢
-        self._cache = {}
+        # 快取最近的查詢（LRU）
+        self._cache = OrderedDict()
+        self._cache_by_zy = defaultdict(set)  # 注音 -> 快取鍵，用於提交時失效
         self._cache_size = 100
     
     def get_candidates(self, zhuyin: str, context: str = "", 
@@ -59,77 +97,66 @@ class CandidateEngine:
             return []
         
         # 檢查快取
-        cache_key = f"{zhuyin}:{context}"
+        cache_key = (zhuyin, context)
         if cache_key in self._cache:
-            return self._cache[cache_key]
+            self._cache.move_to_end(cache_key)
+            return list(self._cache[cache_key])
         
-        candidates = []
+        rows = []
         seen = set()  # 避免重複
         
-        # 1. 用戶偏好（最高優先）
-        user_prefs = self.user_db.get_user_preference(zhuyin, limit=10)
-        for phrase, use_count in user_prefs:
-            if phrase not in seen:
-                candidates.append(Candidate(
-                    phrase=phrase,
-                    zhuyin=zhuyin,
-                    frequency=10000 + use_count * 100,  # 給予高權重
-                    source='learned',
-                    is_exact=True
-                ))
-                seen.add(phrase)
-        
-        # 2. 完全匹配
-        exact_matches = self.phrase_db.search(zhuyin, limit=limit)
-        for phrase, zy, freq in exact_matches:
-            if phrase not in seen:
-                candidates.append(Candidate(
-                    phrase=phrase,
-                    zhuyin=zy,
-                    frequency=freq,
-                    source='system',
-                    is_exact=True
-                ))
-                seen.add(phrase)
+        for key, row in self._iter_sources(zhuyin, context, limit, rows):
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(row)
         
-        # 3. 前綴匹配（部分輸入時）
-        if len(candidates) < limit:
-            prefix_matches = self.phrase_db.search_prefix(zhuyin, limit=limit)
-            for phrase, zy, freq in prefix_matches:
-                if phrase not in seen:
-                    candidates.append(Candidate(
-                        phrase=phrase,
-                        zhuyin=zy,
-                        frequency=freq // 2,  # 降低權重
-                        source='system',
-                        is_exact=False
-                    ))
-                    seen.add(phrase)
-        
-        # 4. 聯想詞（基於上下文）
-        if context and len(candidates) < limit:
-            associated = self.phrase_db.get_associated_phrases(context[-1], limit=10)
-            for phrase, zy, freq in associated:
-                if phrase not in seen and phrase.startswith(context[-1]):
-                    candidates.append(Candidate(
-                        phrase=phrase[1:],  # 去掉第一個字（已輸入）
-                        zhuyin=zy,
-                        frequency=freq // 3,
-                        source='system',
-                        is_exact=False
-                    ))
-                    seen.add(phrase)
-        
-        # 排序
-        candidates = self._sort_candidates(candidates)
-        candidates = candidates[:limit]
+        # 排序（只取前 limit 個），只為留下的資料建立 Candidate
+        rows = self._sort_candidates(rows, limit, key=_row_sort_key)
+        candidates = [Candidate(*row) for row in rows]
         
         # 更新快取
         self._update_cache(cache_key, candidates)
         
         return candidates
     
-    def _sort_candidates(self, candidates: List[Candidate]) -> List[Candidate]:
+    def _iter_sources(self, zhuyin: str, context: str, limit: int,
+                      collected: list) -> Iterator[tuple]:
+        """
+        依優先順序產生各來源的候選資料
+        
+        Args:
+            zhuyin: 輸入的注音
+            context: 上下文
+            limit: 最大候選數
+            collected: 目前已收集的候選列表，用於決定是否查詢後續來源
+            
+        Yields:
+            (去重鍵, (詞組, 注音, 詞頻, 來源, 是否完全匹配))
+        """
+        # 1. 用戶偏好（最高優先，給予高權重）與自訂詞組，一次查出
+        for phrase, zy, score, source in self.user_db.get_merged_candidates(zhuyin):
+            yield phrase, (phrase, zy, score, source, True)
+        
+        # 2. 完全匹配
+        for phrase, zy, freq in self.phrase_db.search(zhuyin, limit=limit):
+            yield phrase, (phrase, zy, freq, 'system', True)
+        
+        # 3. 前綴匹配（部分輸入時）
+        if len(collected) < limit:
+            for phrase, zy, freq in self.phrase_db.search_prefix(zhuyin, limit=limit):
+                yield phrase, (phrase, zy, freq // 2, 'system', False)  # 降低權重
+        
+        # 4. 聯想詞（基於上下文）
+        if context and len(collected) < limit:
+            last_char = context[-1]
+            for phrase, zy, freq in self.phrase_db.get_associated_phrases(last_char, limit=10):
+                if phrase.startswith(last_char):
+                    # 去掉第一個字（已輸入），以完整詞組去重
+                    yield phrase, (phrase[1:], zy, freq // 3, 'system', False)
+    
+    def _sort_candidates(self, candidates: list, limit: Optional[int] = None,
+                         key=_sort_key) -> list:
         """
         排序候選詞
         
@@ -137,38 +164,36 @@ class CandidateEngine:
         1. 完全匹配優先
         2. 詞組長度適中優先（2-4字）
         3. 詞頻高優先
+        
+        Args:
+            candidates: 候選詞列表（或與 Candidate 欄位順序相同的資料列）
+            limit: 只回傳前幾個，None 表示全部
+            key: 排序鍵，資料列請用 _row_sort_key
         """
-        def sort_key(c: Candidate):
-            # 完全匹配加分
-            exact_score = 10000 if c.is_exact else 0
-            
-            # 長度分數（2-4字最佳）
-            length = len(c.phrase)
-            if 2 <= length <= 4:
-                length_score = 5000
-            elif length == 1:
-                length_score = 3000
-            else:
-                length_score = 1000
-            
-            # 來源分數
-            source_score = {
-                'learned': 8000,
-                'user': 6000,
-                'system': 4000
-            }.get(c.source, 0)
-            
-            return -(exact_score + length_score + source_score + c.frequency)
+        if limit is None:
+            return sorted(candidates, key=key)
         
-        return sorted(candidates, key=sort_key)
+        # 候選數遠大於 limit 時使用部分選取，結果與完整排序後截斷相同
+        if len(candidates) > limit * 2:
+            return heapq.nsmallest(limit, candidates, key=key)
+        return sorted(candidates, key=key)[:limit]
     
-    def _update_cache(self, key: str, value: List[Candidate]):
-        """更新快取"""
-        if len(self._cache) >= self._cache_size:
-            # 移除最舊的項目
-            oldest = next(iter(self._cache))
-            del self._cache[oldest]
-        self._cache[key] = value
+    def _update_cache(self, key: Tuple[str, str], value: List[Candidate]):
+        """更新快取，key 為 (注音, 上下文)"""
+        # 以 tuple 保存，呼叫端修改回傳的列表不會影響快取
+        self._cache[key] = tuple(value)
+        self._cache.move_to_end(key)
+        self._cache_by_zy[key[0]].add(key)
+        
+        if len(self._cache) > self._cache_size:
+            # 移除最久未使用的項目
+            oldest, _ = self._cache.popitem(last=False)
+            oldest_zy = oldest[0]
+            keys = self._cache_by_zy.get(oldest_zy)
+            if keys is not None:
+                keys.discard(oldest)
+                if not keys:
+                    del self._cache_by_zy[oldest_zy]
     
     def commit_selection(self, candidate: Candidate):
         """
@@ -180,9 +205,12 @@ class CandidateEngine:
         self.user_db.record_selection(candidate.zhuyin, candidate.phrase)
         
         # 清除相關快取
-        keys_to_remove = [k for k in self._cache if candidate.zhuyin in k]
-        for k in keys_to_remove:
-            del self._cache[k]
+        for k in self._cache_by_zy.pop(candidate.zhuyin, ()):
+            self._cache.pop(k, None)
+    
+    def end_session(self):
+        """結束輸入 session：將暫存的選字記錄寫入用戶詞庫"""
+        self.user_db.flush_selections()
     
     def get_single_char_candidates(self, zhuyin: str) -> List[Candidate]:
         """取得單字候選"""
@@ -200,14 +228,18 @@ class CandidateEngine:
         
         # 加入用戶偏好
         user_prefs = self.user_db.get_user_preference(zhuyin, limit=5)
+        if not user_prefs:
+            return candidates
+        
+        pos = {c.phrase: i for i, c in enumerate(candidates)}
+        learned = []
         for phrase, use_count in user_prefs:
             if len(phrase) == 1:
-                # 將用戶偏好移到最前面
-                for i, c in enumerate(candidates):
-                    if c.phrase == phrase:
-                        candidates.pop(i)
-                        break
-                candidates.insert(0, Candidate(
+                # 將用戶偏好移到最前面（後處理的排在更前面）
+                i = pos.pop(phrase, None)
+                if i is not None:
+                    candidates[i] = None
+                learned.append(Candidate(
                     phrase=phrase,
                     zhuyin=zhuyin,
                     frequency=10000 + use_count * 100,
@@ -215,7 +247,12 @@ class CandidateEngine:
                     is_exact=True
                 ))
         
-        return candidates
+        if not learned:
+            return candidates
+        
+        learned.reverse()
+        learned.extend(c for c in candidates if c is not None)
+        return learned
     
     def get_phrase_candidates(self, syllables: List[str]) -> List[Candidate]:
         """
@@ -238,6 +275,7 @@ class CandidateEngine:
     def clear_cache(self):
         """清除快取"""
         self._cache.clear()
+        self._cache_by_zy.clear()
     
     def add_user_phrase(self, zhuyin: str, phrase: str):
         """新增用戶自訂詞組"""
@@ -252,13 +290,14 @@ class SmartCandidateEngine(CandidateEngine):
         super().__init__(*args, **kwargs)
         self._recent_output = []  # 最近輸出的文字
         self._max_recent = 10
+        self._context_len = 3     # 作為上下文的最近輸出數
+        self._context_str = ""    # 最近輸出組成的上下文，於提交時更新
     
     def get_candidates_smart(self, zhuyin: str) -> List[Candidate]:
         """
         智能取得候選詞（考慮上下文）
         """
-        context = ''.join(self._recent_output[-3:]) if self._recent_output else ""
-        return self.get_candidates(zhuyin, context)
+        return self.get_candidates(zhuyin, self._context_str)
     
     def commit_and_record(self, candidate: Candidate) -> str:
         """
@@ -273,9 +312,16 @@ class SmartCandidateEngine(CandidateEngine):
         self._recent_output.append(candidate.phrase)
         if len(self._recent_output) > self._max_recent:
             self._recent_output.pop(0)
+        self._context_str = ''.join(self._recent_output[-self._context_len:])
         
         return candidate.phrase
     
+    def end_session(self):
+        """結束輸入 session：保存選字記錄並清除上下文"""
+        super().end_session()
+        self._recent_output.clear()
+        self._context_str = ""
+    
     def get_continuation_candidates(self) -> List[Candidate]:
         """取得續打候選詞（基於最近輸出）"""
         if not self._recent_output:
@@ -305,3 +351,4 @@ class SmartCandidateEngine(CandidateEngine):
     def clear_context(self):
         """清除上下文"""
         self._recent_output.clear()
+        self._context_str = ""
@@ -5,64 +5,172 @@
 
 import os
 import json
+import pickle
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
-from collections import defaultdict
-import xbmcaddon
-import xbmcvfs
+from typing import Dict, List, Set, Tuple, Optional
+from collections import Counter, defaultdict
+from heapq import nlargest
+from operator import itemgetter
+from ..utils.config import get_profile_path
+
+# orjson 為選用加速套件，不存在時使用標準 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(data) -> bytes:
+    """序列化為 UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(raw: bytes):
+    """解析 UTF-8 JSON（orjson 的解析錯誤同樣是 json.JSONDecodeError）"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 class LearningEngine:
     """用戶習慣學習引擎"""
     
+    # 儲存頻率：累積選擇數或距上次儲存秒數，任一達到即儲存
+    SAVE_EVERY = 50
+    SAVE_INTERVAL = 60.0
+    
     def __init__(self):
-        addon = xbmcaddon.Addon()
-        self.profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        self.profile_path = get_profile_path()
         
         if not os.path.exists(self.profile_path):
             os.makedirs(self.profile_path)
         
-        self.stats_file = os.path.join(self.profile_path, 'learning_stats.json')
+        self.stats_file = os.path.join(self.profile_path, 'learning_stats.pkl')
+        # 舊版 JSON 格式，僅用於首次載入時轉換
+        self._legacy_stats_file = os.path.join(self.profile_path, 'learning_stats.json')
         
-        # 統計資料
-        self._phrase_usage: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
-        self._bigram_usage: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # 統計資料，以 (注音, 詞組) / (前字, 後字) 為鍵
+        self._phrase_usage: Counter = Counter()
+        self._bigram_usage: Counter = Counter()
+        # 次要索引：注音 -> 詞組集合、前字 -> {後字: 次數}（與 _bigram_usage 同步）
+        self._phrases_by_zy: Dict[str, Set[str]] = defaultdict(set)
+        self._nexts_by_prev: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_selections = 0  # _phrase_usage 次數總和
         self._session_data: List[Tuple[str, str]] = []
         
-        self._load_stats()
+        # 儲存狀態
+        self._dirty = 0
+        self._last_save = time.monotonic()
+        self._save_lock = threading.Lock()
+        self._save_seq = 0      # 快照序號
+        self._written_seq = 0   # 已寫入的最新快照序號
+        
+        # 統計資料於第一次使用時才載入
+        self._loaded = False
+    
+    def _ensure_loaded(self):
+        """確保統計資料已載入"""
+        if not self._loaded:
+            self._load_stats()
     
     def _load_stats(self):
         """載入統計資料"""
+        self._loaded = True
         if os.path.exists(self.stats_file):
             try:
-                with open(self.stats_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # 還原 defaultdict
-                    for zy, phrases in data.get('phrase_usage', {}).items():
-                        for phrase, count in phrases.items():
-                            self._phrase_usage[zy][phrase] = count
+                with open(self.stats_file, 'rb') as f:
+                    data = pickle.load(f)
+                
+                self._phrase_usage.update(data.get('phrase_usage', {}))
+                self._bigram_usage.update(data.get('bigram_usage', {}))
+                for zy, phrase in self._phrase_usage:
+                    self._phrases_by_zy[zy].add(phrase)
+                for (prev, next_char), count in self._bigram_usage.items():
+                    self._nexts_by_prev[prev][next_char] = count
+                self._total_selections = sum(self._phrase_usage.values())
                     
-                    for prev, nexts in data.get('bigram_usage', {}).items():
-                        for next_char, count in nexts.items():
-                            self._bigram_usage[prev][next_char] = count
+            except (pickle.UnpicklingError, EOFError, AttributeError,
+                    ValueError, TypeError, IOError):
+                pass  # 使用預設值
+        
+        elif os.path.exists(self._legacy_stats_file):
+            try:
+                with open(self._legacy_stats_file, 'rb') as f:
+                    data = _json_loads(f.read())
+                    self._merge_data(data, replace=True)
                             
-            except (json.JSONDecodeError, IOError):
+            except (json.JSONDecodeError, UnicodeDecodeError, IOError):
                 pass  # 使用預設值
     
-    def _save_stats(self):
-        """儲存統計資料"""
-        data = {
-            'phrase_usage': {k: dict(v) for k, v in self._phrase_usage.items()},
-            'bigram_usage': {k: dict(v) for k, v in self._bigram_usage.items()},
+    def _merge_data(self, data: dict, replace: bool = False):
+        """
+        將巢狀格式的資料併入統計
+        
+        Args:
+            data: {'phrase_usage': {注音: {詞組: 次數}}, 'bigram_usage': {...}}
+            replace: True 則覆蓋次數，False 則累加
+        """
+        for zy, phrases in data.get('phrase_usage', {}).items():
+            for phrase, count in phrases.items():
+                key = (zy, phrase)
+                self._phrase_usage[key] = count if replace else self._phrase_usage[key] + count
+                self._phrases_by_zy[zy].add(phrase)
+        
+        for prev, nexts in data.get('bigram_usage', {}).items():
+            for next_char, count in nexts.items():
+                key = (prev, next_char)
+                self._bigram_usage[key] = count if replace else self._bigram_usage[key] + count
+                self._nexts_by_prev[prev][next_char] = self._bigram_usage[key]
+        
+        self._total_selections = sum(self._phrase_usage.values())
+    
+    @staticmethod
+    def _to_nested(usage: Counter) -> Dict[str, Dict[str, int]]:
+        """將扁平統計轉回巢狀格式（用於序列化）"""
+        nested: Dict[str, Dict[str, int]] = {}
+        for (first, second), count in usage.items():
+            nested.setdefault(first, {})[second] = count
+        return nested
+    
+    def _snapshot(self) -> dict:
+        """取得統計資料快照，並重設儲存狀態"""
+        self._dirty = 0
+        self._last_save = time.monotonic()
+        self._save_seq += 1
+        return {
+            'seq': self._save_seq,
+            'phrase_usage': dict(self._phrase_usage),
+            'bigram_usage': dict(self._bigram_usage),
             'last_updated': datetime.now().isoformat()
         }
-        
-        try:
-            with open(self.stats_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except IOError:
-            pass
+    
+    def _write_stats(self, data: dict):
+        """寫入統計資料（先寫暫存檔再替換，避免中斷時損毀）"""
+        tmp_file = self.stats_file + '.tmp'
+        with self._save_lock:
+            # 較新的快照已寫入時略過
+            if data['seq'] <= self._written_seq:
+                return
+            self._written_seq = data['seq']
+            try:
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_file, self.stats_file)
+            except (IOError, pickle.PicklingError):
+                pass
+    
+    def _save_stats(self):
+        """儲存統計資料（內部格式，匯出請用 export_data）"""
+        self._write_stats(self._snapshot())
+    
+    def _save_stats_async(self):
+        """於背景執行緒儲存統計資料"""
+        threading.Thread(target=self._write_stats, args=(self._snapshot(),),
+                         daemon=True).start()
     
     def record_selection(self, zhuyin: str, phrase: str, prev_char: str = ""):
         """
@@ -73,19 +181,26 @@ class LearningEngine:
             phrase: 選擇的詞組
             prev_char: 前一個字（用於 bigram）
         """
+        self._ensure_loaded()
         # 記錄詞組使用
-        self._phrase_usage[zhuyin][phrase] += 1
+        self._phrase_usage[(zhuyin, phrase)] += 1
+        self._phrases_by_zy[zhuyin].add(phrase)
+        self._total_selections += 1
         
         # 記錄 bigram（字與字之間的關聯）
         if prev_char and phrase:
-            self._bigram_usage[prev_char][phrase[0]] += 1
+            key = (prev_char, phrase[0])
+            self._bigram_usage[key] += 1
+            self._nexts_by_prev[prev_char][phrase[0]] = self._bigram_usage[key]
         
         # 記錄到 session
         self._session_data.append((zhuyin, phrase))
         
         # 定期儲存
-        if len(self._session_data) % 10 == 0:
-            self._save_stats()
+        self._dirty += 1
+        if (self._dirty >= self.SAVE_EVERY or
+                time.monotonic() - self._last_save >= self.SAVE_INTERVAL):
+            self._save_stats_async()
     
     def get_preference_score(self, zhuyin: str, phrase: str) -> int:
         """
@@ -98,7 +213,8 @@ class LearningEngine:
         Returns:
             偏好分數（使用次數）
         """
-        return self._phrase_usage.get(zhuyin, {}).get(phrase, 0)
+        self._ensure_loaded()
+        return self._phrase_usage.get((zhuyin, phrase), 0)
     
     def get_bigram_score(self, prev_char: str, next_char: str) -> int:
         """
@@ -111,14 +227,17 @@ class LearningEngine:
         Returns:
             關聯分數
         """
-        return self._bigram_usage.get(prev_char, {}).get(next_char, 0)
+        self._ensure_loaded()
+        return self._bigram_usage.get((prev_char, next_char), 0)
     
     def get_preferred_phrase(self, zhuyin: str) -> Optional[str]:
         """取得最常用的詞組"""
-        phrases = self._phrase_usage.get(zhuyin, {})
+        self._ensure_loaded()
+        phrases = self._phrases_by_zy.get(zhuyin)
         if not phrases:
             return None
-        return max(phrases.items(), key=lambda x: x[1])[0]
+        usage = self._phrase_usage
+        return max(phrases, key=lambda p: usage[(zhuyin, p)])
     
     def get_likely_next_chars(self, prev_char: str, limit: int = 5) -> List[Tuple[str, int]]:
         """
@@ -131,12 +250,12 @@ class LearningEngine:
         Returns:
             [(字, 分數), ...]
         """
-        nexts = self._bigram_usage.get(prev_char, {})
+        self._ensure_loaded()
+        nexts = self._nexts_by_prev.get(prev_char)
         if not nexts:
             return []
         
-        sorted_nexts = sorted(nexts.items(), key=lambda x: x[1], reverse=True)
-        return sorted_nexts[:limit]
+        return nlargest(limit, nexts.items(), key=itemgetter(1))
     
     def adjust_candidate_scores(self, candidates: list, prev_char: str = "") -> list:
         """
@@ -149,42 +268,64 @@ class LearningEngine:
         Returns:
             調整後的候選詞列表
         """
+        self._ensure_loaded()
+        # 只查詢有資料的部分，沒有學習紀錄時直接略過
+        phrase_usage = self._phrase_usage.get if self._phrase_usage else None
+        nexts = self._nexts_by_prev.get(prev_char) if prev_char else None
+        
+        if phrase_usage is None and not nexts:
+            return candidates
+        
         for candidate in candidates:
             # 加入使用偏好分數
-            pref_score = self.get_preference_score(candidate.zhuyin, candidate.phrase)
-            candidate.frequency += pref_score * 100
+            if phrase_usage is not None:
+                pref_score = phrase_usage((candidate.zhuyin, candidate.phrase), 0)
+                if pref_score:
+                    candidate.frequency += pref_score * 100
             
             # 加入 bigram 分數
-            if prev_char and candidate.phrase:
-                bigram_score = self.get_bigram_score(prev_char, candidate.phrase[0])
-                candidate.frequency += bigram_score * 50
+            if nexts and candidate.phrase:
+                bigram_score = nexts.get(candidate.phrase[0])
+                if bigram_score:
+                    candidate.frequency += bigram_score * 50
         
         return candidates
     
     def end_session(self):
         """結束輸入 session，儲存資料"""
-        # 這裡可以加入儲存用戶習慣的邏輯
-        pass
+        if self._dirty:
+            self._save_stats()
     
     def clear_learning_data(self):
         """清除所有學習資料"""
         self._phrase_usage.clear()
         self._bigram_usage.clear()
+        self._phrases_by_zy.clear()
+        self._nexts_by_prev.clear()
         self._session_data.clear()
+        self._total_selections = 0
+        self._loaded = True
+        self._dirty = 0
         
-        if os.path.exists(self.stats_file):
-            os.remove(self.stats_file)
+        with self._save_lock:
+            # 讓已排程但尚未寫入的舊快照失效，避免把清除前的資料寫回
+            self._save_seq += 1
+            self._written_seq = self._save_seq
+            for path in (self.stats_file, self._legacy_stats_file):
+                if os.path.exists(path):
+                    os.remove(path)
     
     def export_data(self, file_path: str):
         """匯出學習資料"""
+        self._ensure_loaded()
         data = {
-            'phrase_usage': {k: dict(v) for k, v in self._phrase_usage.items()},
-            'bigram_usage': {k: dict(v) for k, v in self._bigram_usage.items()},
+            'phrase_usage': self._to_nested(self._phrase_usage),
+            'bigram_usage': self._to_nested(self._bigram_usage),
             'exported_at': datetime.now().isoformat()
         }
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(file_path, 'wb') as f:
+            f.write(_json_dumps(data))
     
     def import_data(self, file_path: str, merge: bool = True):
         """
@@ -194,36 +335,26 @@ class LearningEngine:
             file_path: 檔案路徑
             merge: 是否合併（True）或覆蓋（False）
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        self._ensure_loaded()
+        with open(file_path, 'rb') as f:
+            data = _json_loads(f.read())
         
         if not merge:
             self._phrase_usage.clear()
             self._bigram_usage.clear()
+            self._phrases_by_zy.clear()
+            self._nexts_by_prev.clear()
         
-        for zy, phrases in data.get('phrase_usage', {}).items():
-            for phrase, count in phrases.items():
-                self._phrase_usage[zy][phrase] += count
-        
-        for prev, nexts in data.get('bigram_usage', {}).items():
-            for next_char, count in nexts.items():
-                self._bigram_usage[prev][next_char] += count
+        self._merge_data(data)
         
         self._save_stats()
     
     def get_statistics(self) -> dict:
         """取得學習統計"""
-        total_phrases = sum(
-            sum(phrases.values()) 
-            for phrases in self._phrase_usage.values()
-        )
-        
-        unique_phrases = sum(
-            len(phrases) 
-            for phrases in self._phrase_usage.values()
-        )
-        
-        unique_zhuyin = len(self._phrase_usage)
+        self._ensure_loaded()
+        total_phrases = self._total_selections
+        unique_phrases = len(self._phrase_usage)
+        unique_zhuyin = len(self._phrases_by_zy)
         
         return {
             'total_selections': total_phrases,
@@ -231,3 +362,15 @@ class LearningEngine:
             'unique_zhuyin': unique_zhuyin,
             'session_count': len(self._session_data)
         }
+
+
+# 全域學習引擎實例
+_learning_instance: Optional[LearningEngine] = None
+
+
+def get_learning_engine() -> LearningEngine:
+    """取得全域學習引擎實例"""
+    global _learning_instance
+    if _learning_instance is None:
+        _learning_instance = LearningEngine()
+    return _learning_instance
@@ -4,16 +4,177 @@
 """
 
 import os
+import sys
+import time
+import atexit
 import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+from itertools import groupby
+from operator import itemgetter
 from typing import List, Optional, Tuple
 from contextlib import contextmanager
-import xbmcaddon
-import xbmcvfs
+from ..utils.constants import TONE_MARKS
+from ..utils.config import get_addon_path, get_profile_path
+
+
+_STATEMENT_CACHE_SIZE = 256
+_QUERY_CACHE_SIZE = 512
+
+# 移除聲調符號用的轉換表（一聲無符號）
+_TONE_STRIP_TABLE = str.maketrans('', '', ''.join(TONE_MARKS[1:]))
+
+
+def _strip_tones(zhuyin: str) -> str:
+    """移除注音字串中所有音節的聲調符號"""
+    return zhuyin.translate(_TONE_STRIP_TABLE)
+
+# 熱路徑查詢（固定字串，讓連線的 statement cache 重用已編譯的語句）
+_Q_SEARCH_EXACT = '''
+    SELECT phrase, zhuyin, frequency
+    FROM phrases
+    WHERE zhuyin = ?
+    ORDER BY frequency DESC, length ASC
+    LIMIT ?
+'''
+
+_Q_SEARCH_PREFIX = '''
+    SELECT phrase, zhuyin, frequency
+    FROM phrases
+    WHERE zhuyin >= ? AND zhuyin < ?
+    ORDER BY length ASC, frequency DESC
+    LIMIT ?
+'''
+
+_Q_SEARCH_NOTONE = '''
+    SELECT phrase, zhuyin, frequency
+    FROM phrases
+    WHERE zhuyin_notone = ?
+    ORDER BY frequency DESC, length ASC
+    LIMIT ?
+'''
+
+_Q_SINGLE_CHAR = '''
+    SELECT phrase, frequency
+    FROM phrases
+    WHERE zhuyin = ? AND length = 1
+    ORDER BY frequency DESC
+    LIMIT ?
+'''
+
+_Q_ASSOCIATED = '''
+    SELECT phrase, zhuyin, frequency
+    FROM phrases
+    WHERE phrase >= ? AND phrase < ? AND length > 1
+    ORDER BY frequency DESC
+    LIMIT ?
+'''
+
+_Q_ADD_PHRASE = '''
+    INSERT OR REPLACE INTO phrases (zhuyin, phrase, frequency, length, zhuyin_notone)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_Q_UPDATE_FREQUENCY = '''
+    UPDATE phrases
+    SET frequency = frequency + ?
+    WHERE zhuyin = ? AND phrase = ?
+'''
+
+_Q_RECORD_SELECTION = '''
+    INSERT INTO user_history (zhuyin, phrase, use_count, last_used)
+    VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT(zhuyin, phrase) DO UPDATE SET
+        use_count = use_count + 1,
+        last_used = CURRENT_TIMESTAMP
+'''
+
+_Q_USER_PREF = '''
+    SELECT phrase, use_count
+    FROM user_history
+    WHERE zhuyin = ?
+    ORDER BY use_count DESC, last_used DESC
+    LIMIT ?
+'''
+
+# 用戶選字歷史與自訂詞組合併為單一查詢（各自排序、取筆數後依序串接）
+_Q_USER_MERGED = '''
+    SELECT phrase, zhuyin, score, source FROM (
+        SELECT phrase, zhuyin, 10000 + use_count * 100 AS score, 'learned' AS source
+        FROM user_history
+        WHERE zhuyin = ?
+        ORDER BY use_count DESC, last_used DESC
+        LIMIT ?
+    )
+    UNION ALL
+    SELECT phrase, zhuyin, score, source FROM (
+        SELECT phrase, zhuyin, frequency AS score, 'user' AS source
+        FROM phrases
+        WHERE zhuyin = ?
+        ORDER BY frequency DESC, length ASC
+        LIMIT ?
+    )
+'''
+
+
+def _cached_query(method):
+    """
+    查詢結果快取（LRU），以方法名稱與參數為鍵
+    
+    結果以 tuple 保存，每次回傳新的 list；寫入操作須呼叫
+    _invalidate_query_cache 清除快取。查詢前會先寫入暫存的語句。
+    """
+    name = method.__name__
+    
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (name, args, tuple(kwargs.items()))
+        with self._lock:
+            if self._write_buf:
+                self._flush_writes()
+            
+            cache = self._query_cache
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                return list(cached)
+            
+            result = method(self, *args, **kwargs)
+            cache[key] = tuple(result)
+            if len(cache) > _QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+            return result
+    
+    return wrapper
 
 
 class PhraseDatabase:
     """詞庫資料庫管理"""
     
+    # phrases 表的次要索引 (名稱, 定義)，大量匯入時先移除再重建
+    PHRASE_INDEXES = (
+        ('idx_zhuyin_freq', 'phrases(zhuyin, frequency DESC, length ASC)'),
+        ('idx_notone_freq', 'phrases(zhuyin_notone, frequency DESC, length ASC)'),
+        ('idx_phrase_cover', 'phrases(phrase, length, frequency, zhuyin)'),
+    )
+    
+    # 舊版建立、已被上列索引取代或沒有查詢使用的索引
+    OBSOLETE_INDEXES = (
+        'idx_zhuyin',
+        'idx_zhuyin_prefix',
+        'idx_freq',
+        'idx_length',
+        'idx_zhuyin_notone',
+        'idx_phrase',
+    )
+    
+    # 匯入時每批寫入的筆數
+    IMPORT_BATCH_SIZE = 5000
+    
+    # add_phrase / update_frequency 累積到此筆數才寫入
+    WRITE_FLUSH_EVERY = 32
+    
     def __init__(self, db_path: Optional[str] = None):
         """
         初始化詞庫
@@ -24,14 +185,22 @@ class PhraseDatabase:
         self.read_only = False
         
         if db_path is None:
-            addon = xbmcaddon.Addon()
-            addon_path = xbmcvfs.translatePath(addon.getAddonInfo('path'))
-            db_path = os.path.join(addon_path, 'resources', 'data', 'phrases.db')
+            db_path = os.path.join(get_addon_path(), 'resources', 'data', 'phrases.db')
             # 系統詞庫預設為唯讀，避免在唯讀檔案系統上出錯
             self.read_only = True
         
         self.db_path = db_path
         
+        # 長駐連線，第一次使用時開啟
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        
+        # 查詢結果快取
+        self._query_cache: OrderedDict = OrderedDict()
+        
+        # 待寫入的 (SQL, 參數)，查詢或關閉前寫入
+        self._write_buf: List[Tuple[str, tuple]] = []
+        
         # 只有非唯讀模式才嘗試建立/更新資料庫結構
         if not self.read_only:
             self._ensure_database()
@@ -52,21 +221,32 @@ class PhraseDatabase:
                     phrase TEXT NOT NULL,
                     frequency INTEGER DEFAULT 100,
                     length INTEGER,
+                    zhuyin_notone TEXT,
                     UNIQUE(zhuyin, phrase)
                 )
             ''')
             
+            # 舊版資料庫補上去除聲調的注音欄位
+            # table_info 每列為 (cid, name, type, notnull, dflt_value, pk)
+            columns = {row[1] for row in cursor.execute('PRAGMA table_info(phrases)')}
+            if 'zhuyin_notone' not in columns:
+                cursor.execute('ALTER TABLE phrases ADD COLUMN zhuyin_notone TEXT')
+                cursor.execute('UPDATE phrases SET zhuyin_notone = strip_tones(zhuyin)')
+            
             # 索引
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_zhuyin ON phrases(zhuyin)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_zhuyin_prefix ON phrases(zhuyin COLLATE NOCASE)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_freq ON phrases(frequency DESC)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_length ON phrases(length)')
+            for name in self.OBSOLETE_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            self._create_indexes(cursor)
             
             conn.commit()
     
-    @contextmanager
-    def _get_connection(self):
-        """取得資料庫連線"""
+    def _create_indexes(self, cursor: sqlite3.Cursor):
+        """建立 phrases 表的次要索引"""
+        for name, definition in self.PHRASE_INDEXES:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """開啟資料庫連線並套用效能設定"""
         if self.read_only:
             # 使用 URI 模式開啟唯讀連線
             # 注意：Windows 路徑可能需要特殊處理，但在 Kodi 環境通常沒問題
@@ -74,19 +254,66 @@ class PhraseDatabase:
             try:
                 # 嘗試使用 URI 模式 (Python 3.4+)
                 uri_path = f"file:{self.db_path}?mode=ro"
-                conn = sqlite3.connect(uri_path, uri=True)
+                conn = sqlite3.connect(uri_path, uri=True, check_same_thread=False,
+                                       cached_statements=_STATEMENT_CACHE_SIZE)
             except sqlite3.OperationalError:
                 # 降級處理
-                conn = sqlite3.connect(self.db_path)
+                conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                       cached_statements=_STATEMENT_CACHE_SIZE)
         else:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=_STATEMENT_CACHE_SIZE)
+        
+        # 不設定 row_factory：查詢直接回傳 tuple，省去每列建立 Row 物件
+        
+        # 快取與暫存設定（唯讀連線同樣適用）
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute('PRAGMA cache_size = -64000')
+        conn.execute('PRAGMA mmap_size = 67108864')
+        
+        # WAL 需要寫入權限，只套用在可寫入的資料庫
+        if not self.read_only:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
             
-        conn.row_factory = sqlite3.Row
+            # 讓 SQL 內直接使用與寫入時相同的去聲調規則
+            conn.create_function('strip_tones', 1, _strip_tones, deterministic=True)
+        
+        return conn
+    
+    @contextmanager
+    def _get_connection(self):
+        """取得資料庫連線（長駐連線，不會在使用後關閉）"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                yield self._conn
+            except Exception:
+                # 未提交的變更不可留在長駐連線上
+                self._conn.rollback()
+                raise
+    
+    def _invalidate_query_cache(self):
+        """清除查詢結果快取（資料變更後呼叫）"""
+        with self._lock:
+            self._query_cache.clear()
+    
+    def close(self):
+        """寫入暫存的語句後關閉資料庫連線"""
+        with self._lock:
+            self._flush_writes()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def __del__(self):
         try:
-            yield conn
-        finally:
-            conn.close()
+            self.close()
+        except Exception:
+            pass
     
+    @_cached_query
     def search(self, zhuyin: str, limit: int = 50) -> List[Tuple[str, str, int]]:
         """
         搜尋符合的詞組
@@ -102,19 +329,15 @@ class PhraseDatabase:
             cursor = conn.cursor()
             
             # 完全匹配優先
-            cursor.execute('''
-                SELECT phrase, zhuyin, frequency 
-                FROM phrases 
-                WHERE zhuyin = ?
-                ORDER BY frequency DESC, length ASC
-                LIMIT ?
-            ''', (zhuyin, limit))
+            cursor.execute(_Q_SEARCH_EXACT, (zhuyin, limit))
             
-            results = [(row['phrase'], row['zhuyin'], row['frequency']) 
-                      for row in cursor.fetchall()]
+            # 詞組字串經 intern，候選去重時多半可直接以指標比對
+            results = [(sys.intern(phrase), zhuyin, frequency)
+                      for phrase, zhuyin, frequency in cursor]
             
             return results
     
+    @_cached_query
     def search_prefix(self, zhuyin_prefix: str, limit: int = 50) -> List[Tuple[str, str, int]]:
         """
         前綴搜尋
@@ -129,52 +352,48 @@ class PhraseDatabase:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT phrase, zhuyin, frequency 
-                FROM phrases 
-                WHERE zhuyin LIKE ?
-                ORDER BY length ASC, frequency DESC
-                LIMIT ?
-            ''', (zhuyin_prefix + '%', limit))
+            # 以索引範圍掃描取代 LIKE，只走訪符合前綴的索引區段
+            lower, upper = self._prefix_range(zhuyin_prefix)
+            cursor.execute(_Q_SEARCH_PREFIX, (lower, upper, limit))
             
-            results = [(row['phrase'], row['zhuyin'], row['frequency']) 
-                      for row in cursor.fetchall()]
+            results = [(sys.intern(phrase), zhuyin, frequency)
+                      for phrase, zhuyin, frequency in cursor]
             
             return results
     
+    @_cached_query
     def search_without_tone(self, zhuyin_no_tone: str, limit: int = 50) -> List[Tuple[str, str, int]]:
         """
         不含聲調的模糊搜尋
         
         Args:
-            zhuyin_no_tone: 不含聲調的注音
+            zhuyin_no_tone: 不含聲調的注音（若含聲調會先移除）
             limit: 最大結果數
         """
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # 使用 LIKE 匹配（聲調可為任意字符）
-            pattern = self._create_toneless_pattern(zhuyin_no_tone)
+            # 以預先計算的 zhuyin_notone 欄位做等值查詢（聲調可為任意值）
+            cursor.execute(_Q_SEARCH_NOTONE, (_strip_tones(zhuyin_no_tone), limit))
             
-            cursor.execute('''
-                SELECT phrase, zhuyin, frequency 
-                FROM phrases 
-                WHERE zhuyin LIKE ?
-                ORDER BY frequency DESC, length ASC
-                LIMIT ?
-            ''', (pattern, limit))
-            
-            results = [(row['phrase'], row['zhuyin'], row['frequency']) 
-                      for row in cursor.fetchall()]
+            results = [(sys.intern(phrase), zhuyin, frequency)
+                      for phrase, zhuyin, frequency in cursor]
             
             return results
     
-    def _create_toneless_pattern(self, zhuyin: str) -> str:
-        """建立忽略聲調的搜尋模式"""
-        # 在每個音節後加入通配符以匹配聲調
-        # 簡化處理：假設輸入已經是單音節
-        return zhuyin + '%'
+    @staticmethod
+    def _prefix_range(prefix: str) -> Tuple[str, str]:
+        """
+        將前綴轉為索引可用的半開區間 [lower, upper)
+        
+        SQLite 預設以 BINARY（UTF-8 位元組）比較，順序與字元碼位一致，
+        因此把前綴最後一個字元加一即為上界。
+        """
+        if not prefix:
+            return '', chr(0x10FFFF)
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
     
+    @_cached_query
     def get_single_char(self, zhuyin: str, limit: int = 20) -> List[Tuple[str, int]]:
         """
         取得單字候選
@@ -189,47 +408,52 @@ class PhraseDatabase:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT phrase, frequency 
-                FROM phrases 
-                WHERE zhuyin = ? AND length = 1
-                ORDER BY frequency DESC
-                LIMIT ?
-            ''', (zhuyin, limit))
+            cursor.execute(_Q_SINGLE_CHAR, (zhuyin, limit))
             
-            return [(row['phrase'], row['frequency']) for row in cursor.fetchall()]
+            return [(sys.intern(phrase), frequency) for phrase, frequency in cursor]
     
     def add_phrase(self, zhuyin: str, phrase: str, frequency: int = 100):
-        """新增詞組"""
+        """新增詞組（暫存後批次寫入）"""
         if self.read_only:
             return
-
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO phrases (zhuyin, phrase, frequency, length)
-                VALUES (?, ?, ?, ?)
-            ''', (zhuyin, phrase, frequency, len(phrase)))
-            
-            conn.commit()
+        
+        self._queue_write(_Q_ADD_PHRASE,
+                          (zhuyin, phrase, frequency, len(phrase), _strip_tones(zhuyin)))
     
     def update_frequency(self, zhuyin: str, phrase: str, increment: int = 1):
-        """更新詞頻"""
+        """更新詞頻（暫存後批次寫入）"""
         if self.read_only:
             return
-
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        
+        self._queue_write(_Q_UPDATE_FREQUENCY, (increment, zhuyin, phrase))
+    
+    def _queue_write(self, sql: str, params: tuple):
+        """加入待寫入的語句，累積到 WRITE_FLUSH_EVERY 筆時寫入"""
+        with self._lock:
+            self._write_buf.append((sql, params))
+            if len(self._write_buf) >= self.WRITE_FLUSH_EVERY:
+                self._flush_writes()
+    
+    def _flush_writes(self):
+        """以單一交易寫入所有待寫入的語句（依加入順序）"""
+        with self._lock:
+            if not self._write_buf:
+                return
             
-            cursor.execute('''
-                UPDATE phrases
-                SET frequency = frequency + ?
-                WHERE zhuyin = ? AND phrase = ?
-            ''', (increment, zhuyin, phrase))
+            batch = self._write_buf
+            self._write_buf = []
             
-            conn.commit()
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                # 相鄰的相同語句合併為一次 executemany
+                for sql, group in groupby(batch, key=itemgetter(0)):
+                    cursor.executemany(sql, [params for _, params in group])
+                
+                conn.commit()
+                self._invalidate_query_cache()
     
+    @_cached_query
     def get_associated_phrases(self, last_char: str, limit: int = 10) -> List[Tuple[str, str, int]]:
         """
         取得聯想詞
@@ -244,17 +468,12 @@ class PhraseDatabase:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # 搜尋以該字開頭的詞組
-            cursor.execute('''
-                SELECT phrase, zhuyin, frequency 
-                FROM phrases 
-                WHERE phrase LIKE ? AND length > 1
-                ORDER BY frequency DESC
-                LIMIT ?
-            ''', (last_char + '%', limit))
+            # 搜尋以該字開頭的詞組（idx_phrase_cover 範圍掃描，不需回表）
+            lower, upper = self._prefix_range(last_char)
+            cursor.execute(_Q_ASSOCIATED, (lower, upper, limit))
             
-            return [(row['phrase'], row['zhuyin'], row['frequency']) 
-                   for row in cursor.fetchall()]
+            return [(sys.intern(phrase), zhuyin, frequency)
+                   for phrase, zhuyin, frequency in cursor]
     
     def import_from_text(self, file_path: str):
         """
@@ -262,10 +481,27 @@ class PhraseDatabase:
         
         格式：每行 "詞組\t注音\t詞頻"
         """
+        if self.read_only:
+            return
+
+        # 先寫入暫存的語句，維持操作順序
+        self._flush_writes()
+        
+        insert_sql = '''
+            INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length, zhuyin_notone)
+            VALUES (?, ?, ?, ?, ?)
+        '''
+        
         with open(file_path, 'r', encoding='utf-8') as f:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
+                # 整個匯入在單一交易內完成；索引先移除，寫完再一次重建
+                cursor.execute('BEGIN IMMEDIATE')
+                for name, _ in self.PHRASE_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+                
+                batch = []
                 for line in f:
                     line = line.strip()
                     if not line or line.startswith('#'):
@@ -277,26 +513,34 @@ class PhraseDatabase:
                         zhuyin = parts[1]
                         frequency = int(parts[2]) if len(parts) > 2 else 100
                         
-                        cursor.execute('''
-                            INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length)
-                            VALUES (?, ?, ?, ?)
-                        ''', (zhuyin, phrase, frequency, len(phrase)))
+                        batch.append((zhuyin, phrase, frequency, len(phrase),
+                                      _strip_tones(zhuyin)))
+                        if len(batch) >= self.IMPORT_BATCH_SIZE:
+                            cursor.executemany(insert_sql, batch)
+                            batch.clear()
                 
+                if batch:
+                    cursor.executemany(insert_sql, batch)
+                
+                self._create_indexes(cursor)
                 conn.commit()
+                self._invalidate_query_cache()
     
     def get_stats(self) -> dict:
         """取得詞庫統計"""
+        self._flush_writes()
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('SELECT COUNT(*) as total FROM phrases')
-            total = cursor.fetchone()['total']
-            
-            cursor.execute('SELECT COUNT(*) as chars FROM phrases WHERE length = 1')
-            chars = cursor.fetchone()['chars']
-            
-            cursor.execute('SELECT COUNT(*) as words FROM phrases WHERE length > 1')
-            words = cursor.fetchone()['words']
+            # 單次掃描同時計算三項統計
+            cursor.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(length = 1), 0),
+                       COALESCE(SUM(length > 1), 0)
+                FROM phrases
+            ''')
+            total, chars, words = cursor.fetchone()
             
             return {
                 'total': total,
@@ -308,9 +552,15 @@ class PhraseDatabase:
 class UserPhraseDatabase(PhraseDatabase):
     """用戶詞庫 - 記錄用戶選字習慣"""
     
+    # 選字記錄累積到此筆數，或最早一筆暫存超過此秒數（於下次選字或查詢時檢查）才寫入資料庫
+    FLUSH_EVERY = 32
+    FLUSH_INTERVAL = 2.0
+    
     def __init__(self):
-        addon = xbmcaddon.Addon()
-        profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        self._pending_selections: List[Tuple[str, str]] = []
+        self._pending_since = 0.0
+        
+        profile_path = get_profile_path()
         
         # 確保目錄存在
         if not os.path.exists(profile_path):
@@ -320,6 +570,9 @@ class UserPhraseDatabase(PhraseDatabase):
         super().__init__(db_path)
         
         self._ensure_user_tables()
+        
+        # 結束時寫入尚未儲存的選字記錄
+        atexit.register(self.flush_selections)
     
     def _ensure_user_tables(self):
         """建立用戶詞庫專用表"""
@@ -352,34 +605,88 @@ class UserPhraseDatabase(PhraseDatabase):
             conn.commit()
     
     def record_selection(self, zhuyin: str, phrase: str):
-        """記錄用戶選擇"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        """記錄用戶選擇（先暫存於記憶體，批次寫入）"""
+        with self._lock:
+            if not self._pending_selections:
+                self._pending_since = time.monotonic()
+            self._pending_selections.append((zhuyin, phrase))
+            
+            if len(self._pending_selections) >= self.FLUSH_EVERY:
+                self.flush_selections()
+            else:
+                self._flush_if_due()
+    
+    def _flush_if_due(self):
+        """暫存的選字記錄超過 FLUSH_INTERVAL 秒時寫入"""
+        if (self._pending_selections and
+                time.monotonic() - self._pending_since >= self.FLUSH_INTERVAL):
+            self.flush_selections()
+    
+    def flush_selections(self):
+        """將暫存的選字記錄以單一交易寫入資料庫"""
+        with self._lock:
+            if not self._pending_selections:
+                return
             
-            cursor.execute('''
-                INSERT INTO user_history (zhuyin, phrase, use_count, last_used)
-                VALUES (?, ?, 1, CURRENT_TIMESTAMP)
-                ON CONFLICT(zhuyin, phrase) DO UPDATE SET
-                    use_count = use_count + 1,
-                    last_used = CURRENT_TIMESTAMP
-            ''', (zhuyin, phrase))
+            batch = self._pending_selections
+            self._pending_selections = []
             
-            conn.commit()
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany(_Q_RECORD_SELECTION, batch)
+                
+                conn.commit()
+                self._invalidate_query_cache()
     
     def get_user_preference(self, zhuyin: str, limit: int = 5) -> List[Tuple[str, int]]:
         """取得用戶偏好的候選詞"""
+        with self._lock:
+            self._flush_pending_for(zhuyin)
+            return self._query_user_preference(zhuyin, limit)
+    
+    def get_merged_candidates(self, zhuyin: str, history_limit: int = 10,
+                              custom_limit: int = 10) -> List[Tuple[str, str, int, str]]:
+        """
+        以單一查詢取得用戶偏好與自訂詞組
+        
+        Args:
+            zhuyin: 注音
+            history_limit: 選字歷史最大筆數
+            custom_limit: 自訂詞組最大筆數
+            
+        Returns:
+            [(phrase, zhuyin, score, source), ...]，選字歷史在前
+            （source 為 'learned'），自訂詞組在後（source 為 'user'）
+        """
+        with self._lock:
+            self._flush_pending_for(zhuyin)
+            return self._query_merged_candidates(zhuyin, history_limit, custom_limit)
+    
+    def _flush_pending_for(self, zhuyin: str):
+        """此注音有尚未寫入的選擇或暫存已逾時時先寫入，避免查詢回傳過時的結果"""
+        self._flush_if_due()
+        if any(pending == zhuyin for pending, _ in self._pending_selections):
+            self.flush_selections()
+    
+    @_cached_query
+    def _query_user_preference(self, zhuyin: str, limit: int) -> List[Tuple[str, int]]:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT phrase, use_count 
-                FROM user_history 
-                WHERE zhuyin = ?
-                ORDER BY use_count DESC, last_used DESC
-                LIMIT ?
-            ''', (zhuyin, limit))
+            cursor.execute(_Q_USER_PREF, (zhuyin, limit))
+            
+            return [(sys.intern(phrase), use_count) for phrase, use_count in cursor]
+    
+    @_cached_query
+    def _query_merged_candidates(self, zhuyin: str, history_limit: int,
+                                 custom_limit: int) -> List[Tuple[str, str, int, str]]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(_Q_USER_MERGED, (zhuyin, history_limit, zhuyin, custom_limit))
             
-            return [(row['phrase'], row['use_count']) for row in cursor.fetchall()]
+            return [(sys.intern(phrase), zy, score, source)
+                    for phrase, zy, score, source in cursor]
     
     def add_custom_phrase(self, zhuyin: str, phrase: str):
         """新增自訂詞組"""
@@ -393,15 +700,35 @@ class UserPhraseDatabase(PhraseDatabase):
             
             # 同時加入主詞庫
             cursor.execute('''
-                INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length)
-                VALUES (?, ?, 1000, ?)
-            ''', (zhuyin, phrase, len(phrase)))
+                INSERT OR IGNORE INTO phrases (zhuyin, phrase, frequency, length, zhuyin_notone)
+                VALUES (?, ?, 1000, ?, ?)
+            ''', (zhuyin, phrase, len(phrase), _strip_tones(zhuyin)))
             
             conn.commit()
+            self._invalidate_query_cache()
+    
+    def close(self):
+        """寫入暫存的選字記錄後關閉資料庫連線"""
+        self.flush_selections()
+        super().close()
     
     def clear_history(self):
         """清除選字歷史"""
         with self._get_connection() as conn:
+            self._pending_selections = []
             cursor = conn.cursor()
             cursor.execute('DELETE FROM user_history')
             conn.commit()
+            self._invalidate_query_cache()
+
+
+# 全域用戶詞庫實例
+_user_db_instance: Optional[UserPhraseDatabase] = None
+
+
+def get_user_phrase_db() -> UserPhraseDatabase:
+    """取得全域用戶詞庫實例"""
+    global _user_db_instance
+    if _user_db_instance is None:
+        _user_db_instance = UserPhraseDatabase()
+    return _user_db_instance
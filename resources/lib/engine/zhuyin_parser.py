@@ -3,14 +3,18 @@
 注音解析器 - 處理注音符號的組合與驗證
 """
 
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
 from ..utils.constants import INITIALS, MEDIALS, FINALS, TONES, TONE_MARKS
 
 
-@dataclass
-class ZhuyinSyllable:
-    """注音音節結構"""
+# 可單獨成音的聲母
+_STANDALONE_INITIALS = frozenset(('ㄓ', 'ㄔ', 'ㄕ', 'ㄖ', 'ㄗ', 'ㄘ', 'ㄙ'))
+
+
+class ZhuyinSyllable(NamedTuple):
+    """注音音節結構（不可變，無 __dict__）"""
     initial: str = ""      # 聲母
     medial: str = ""       # 介音
     final: str = ""        # 韻母
@@ -27,7 +31,7 @@ class ZhuyinSyllable:
     def _is_valid_standalone(self) -> bool:
         """檢查是否為可獨立的音節"""
         # ㄓㄔㄕㄖㄗㄘㄙ 可單獨成音
-        if self.initial in ['ㄓ', 'ㄔ', 'ㄕ', 'ㄖ', 'ㄗ', 'ㄘ', 'ㄙ'] and not self.medial and not self.final:
+        if self.initial in _STANDALONE_INITIALS and not self.medial and not self.final:
             return True
         # 有韻母即可成音
         return bool(self.final) or bool(self.medial)
@@ -40,6 +44,74 @@ class ZhuyinSyllable:
         return f"{self.initial}{self.medial}{self.final}"
 
 
+# 注音符號分類（parse 以查表取代逐一檢查集合）
+_CAT_INITIAL = 0
+_CAT_MEDIAL = 1
+_CAT_FINAL = 2
+_CAT_TONE = 3
+
+# 字元 → 分類對照表
+_CAT = {c: _CAT_INITIAL for c in INITIALS}
+_CAT.update({c: _CAT_MEDIAL for c in MEDIALS})
+_CAT.update({c: _CAT_FINAL for c in FINALS})
+_CAT.update({c: _CAT_TONE for c in TONE_MARKS[1:]})
+
+# 非注音、非空格的字元（解析前以 C 實作的 re 一次濾除）
+_NON_ZHUYIN_RE = re.compile('[^ ' + ''.join(_CAT) + ']')
+
+
+def _new_syllable(initial: str, medial: str, final: str, tone: str) -> ZhuyinSyllable:
+    """建立音節並填入原始輸入"""
+    return ZhuyinSyllable(initial, medial, final, tone, initial + medial + final + tone)
+
+
+@lru_cache(maxsize=256)
+def _parse_sequence(input_sequence: str) -> Tuple[ZhuyinSyllable, ...]:
+    """解析注音序列（依完整輸入快取，音節為不可變物件可安全共用）"""
+    syllables = []
+    append = syllables.append
+    initial = medial = final = ""
+    
+    # 先濾掉未知字符，迴圈只需處理有效符號
+    for char in _NON_ZHUYIN_RE.sub('', input_sequence):
+        # 空格作為分隔符
+        if char == ' ':
+            if initial or medial or final:
+                append(_new_syllable(initial, medial, final, ""))
+                initial = medial = final = ""
+            continue
+        
+        cat = _CAT[char]
+        if cat == _CAT_TONE:
+            # 聲調 - 完成當前音節
+            append(_new_syllable(initial, medial, final, char))
+            initial = medial = final = ""
+        elif cat == _CAT_INITIAL:
+            # 如果當前已有聲母，開始新音節
+            if initial:
+                append(_new_syllable(initial, medial, final, ""))
+                medial = final = ""
+            initial = char
+        elif cat == _CAT_MEDIAL:
+            # 檢查是否應該開始新音節
+            if medial or final:
+                append(_new_syllable(initial, medial, final, ""))
+                initial = final = ""
+            medial = char
+        else:
+            # 韻母
+            if final:
+                append(_new_syllable(initial, medial, final, ""))
+                initial = medial = ""
+            final = char
+    
+    # 處理最後一個音節
+    if initial or medial or final:
+        append(_new_syllable(initial, medial, final, ""))
+    
+    return tuple(syllables)
+
+
 class ZhuyinParser:
     """注音解析器"""
     
@@ -61,6 +133,15 @@ class ZhuyinParser:
         
         # ㄓㄔㄕㄖㄗㄘㄙ 不能配 ㄩ
         self.zhi_group = {'ㄓ', 'ㄔ', 'ㄕ', 'ㄖ', 'ㄗ', 'ㄘ', 'ㄙ'}
+        
+        # 各輸入狀態的補全選項（只取決於狀態，預先建立）
+        tones = tuple(TONE_MARKS[1:])
+        self._completions_empty = tuple(INITIALS) + tuple(MEDIALS)
+        self._completions_jqx = ('ㄧ', 'ㄩ')
+        self._completions_zhi = ('ㄧ', 'ㄨ') + tuple(FINALS) + tones
+        self._completions_initial = tuple(MEDIALS) + tuple(FINALS) + tones
+        self._completions_medial = tuple(FINALS) + tones
+        self._completions_final = tones
     
     def parse(self, input_sequence: str) -> List[ZhuyinSyllable]:
         """
@@ -72,72 +153,7 @@ class ZhuyinParser:
         Returns:
             解析後的音節列表
         """
-        syllables = []
-        current = ZhuyinSyllable()
-        
-        i = 0
-        while i < len(input_sequence):
-            char = input_sequence[i]
-            
-            # 空格作為分隔符
-            if char == ' ':
-                if not current.is_empty():
-                    current.raw = str(current)
-                    syllables.append(current)
-                    current = ZhuyinSyllable()
-                i += 1
-                continue
-            
-            # 聲調 - 完成當前音節
-            if char in self.tones:
-                current.tone = char
-                current.raw = str(current)
-                syllables.append(current)
-                current = ZhuyinSyllable()
-                i += 1
-                continue
-            
-            # 聲母
-            if char in self.initials:
-                # 如果當前已有聲母，開始新音節
-                if current.initial:
-                    current.raw = str(current)
-                    syllables.append(current)
-                    current = ZhuyinSyllable()
-                current.initial = char
-                i += 1
-                continue
-            
-            # 介音
-            if char in self.medials:
-                # 檢查是否應該開始新音節
-                if current.medial or current.final:
-                    current.raw = str(current)
-                    syllables.append(current)
-                    current = ZhuyinSyllable()
-                current.medial = char
-                i += 1
-                continue
-            
-            # 韻母
-            if char in self.finals:
-                if current.final:
-                    current.raw = str(current)
-                    syllables.append(current)
-                    current = ZhuyinSyllable()
-                current.final = char
-                i += 1
-                continue
-            
-            # 未知字符，跳過
-            i += 1
-        
-        # 處理最後一個音節
-        if not current.is_empty():
-            current.raw = str(current)
-            syllables.append(current)
-        
-        return syllables
+        return list(_parse_sequence(input_sequence))
     
     def parse_single(self, input_str: str) -> Optional[ZhuyinSyllable]:
         """解析單一音節"""
@@ -165,7 +181,7 @@ class ZhuyinParser:
         
         return True, ""
     
-    def get_possible_completions(self, partial: str) -> List[str]:
+    def get_possible_completions(self, partial: str) -> Tuple[str, ...]:
         """
         取得可能的補全選項
         
@@ -173,39 +189,31 @@ class ZhuyinParser:
             partial: 部分輸入的注音
             
         Returns:
-            可能的下一個符號列表
+            可能的下一個符號（預先建立的共用 tuple，請勿修改）
         """
         syllable = self.parse_single(partial)
         if not syllable:
             # 空輸入，可以是聲母或介音
-            return list(self.initials) + list(self.medials)
-        
-        completions = []
+            return self._completions_empty
         
         # 根據當前狀態推薦
         if syllable.initial and not syllable.medial and not syllable.final:
             # 只有聲母
             if syllable.initial in self.jqx_constraint:
-                completions.extend(['ㄧ', 'ㄩ'])
-            elif syllable.initial in self.zhi_group:
-                completions.extend(['ㄧ', 'ㄨ'])
-                completions.extend(self.finals)
-                completions.extend(self.tones)
-            else:
-                completions.extend(self.medials)
-                completions.extend(self.finals)
-                completions.extend(self.tones)
+                return self._completions_jqx
+            if syllable.initial in self.zhi_group:
+                return self._completions_zhi
+            return self._completions_initial
         
-        elif syllable.medial and not syllable.final:
+        if syllable.medial and not syllable.final:
             # 有介音無韻母
-            completions.extend(self.finals)
-            completions.extend(self.tones)
+            return self._completions_medial
         
-        elif syllable.final:
+        if syllable.final:
             # 有韻母，只能加聲調
-            completions.extend(self.tones)
+            return self._completions_final
         
-        return completions
+        return ()
     
     def normalize(self, zhuyin: str) -> str:
         """正規化注音字串"""
@@ -4,7 +4,7 @@
 """
 
 import xbmcgui
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from ..engine import Candidate
 
 
@@ -25,20 +25,33 @@ class CandidateListControl:
         self.selected_index = 0
         self.page = 0
         self.page_size = 9
+        
+        # 上次繪製內容的簽章（頁碼與各項顯示文字），相同時不重建列表
+        self._last_signature: Optional[Tuple] = None
+        
+        # 已取得的控制項（getControl 需跨到 Kodi 查找，只查一次）
+        self._control: Optional[xbmcgui.ControlList] = None
+        
+        # 最後一項的索引與最後一頁的頁碼（候選詞變更時更新）
+        self._max_index = -1
+        self._max_page = 0
     
     @property
     def control(self) -> Optional[xbmcgui.ControlList]:
         """取得控制項"""
-        try:
-            return self.window.getControl(self.control_id)
-        except:
-            return None
+        if self._control is None:
+            try:
+                self._control = self.window.getControl(self.control_id)
+            except RuntimeError:
+                return None
+        return self._control
     
     def set_candidates(self, candidates: List[Candidate]):
         """設定候選詞列表"""
         self.candidates = candidates
         self.selected_index = 0
         self.page = 0
+        self._update_bounds()
         self._refresh_display()
     
     def clear(self):
@@ -46,63 +59,87 @@ class CandidateListControl:
         self.candidates = []
         self.selected_index = 0
         self.page = 0
+        self._update_bounds()
         self._refresh_display()
     
+    def _update_bounds(self):
+        """依目前候選詞數量更新索引與頁碼上限"""
+        self._max_index = len(self.candidates) - 1
+        self._max_page = self._max_index // self.page_size if self.candidates else 0
+    
     def _refresh_display(self):
         """更新顯示"""
         control = self.control
         if not control:
+            self._last_signature = None
             return
         
-        control.reset()
-        
         # 計算當前頁的候選詞
         start = self.page * self.page_size
         end = min(start + self.page_size, len(self.candidates))
         page_candidates = self.candidates[start:end]
         
+        # 內容與上次繪製相同時只更新選取位置
+        signature = (self.page, tuple((c.phrase, c.zhuyin, c.frequency)
+                                      for c in page_candidates))
+        if signature != self._last_signature:
+            self._rebuild_items(control, page_candidates)
+            self._last_signature = signature
+        
+        # 選中當前項
+        if page_candidates:
+            control.selectItem(self.selected_index % self.page_size)
+    
+    def _rebuild_items(self, control: xbmcgui.ControlList, page_candidates: List[Candidate]):
+        """清空並重新加入當前頁的列表項目"""
+        control.reset()
+        
         for i, candidate in enumerate(page_candidates):
             display_num = i + 1
             item = xbmcgui.ListItem(f"{display_num}. {candidate.phrase}")
             item.setProperty('zhuyin', candidate.zhuyin)
             item.setProperty('frequency', str(candidate.frequency))
             control.addItem(item)
-        
-        # 選中當前項
-        if page_candidates:
-            control.selectItem(self.selected_index % self.page_size)
     
     def select_next(self):
         """選擇下一個"""
         if not self.candidates:
             return
         
-        self.selected_index = (self.selected_index + 1) % len(self.candidates)
+        index = self.selected_index + 1
+        if index > self._max_index:
+            index = 0
+        self.selected_index = index
         
         # 檢查是否需要翻頁
-        if self.selected_index // self.page_size != self.page:
-            self.page = self.selected_index // self.page_size
+        page, offset = divmod(index, self.page_size)
+        if page != self.page:
+            self.page = page
             self._refresh_display()
         else:
             control = self.control
             if control:
-                control.selectItem(self.selected_index % self.page_size)
+                control.selectItem(offset)
     
     def select_previous(self):
         """選擇上一個"""
         if not self.candidates:
             return
         
-        self.selected_index = (self.selected_index - 1) % len(self.candidates)
+        index = self.selected_index - 1
+        if index < 0:
+            index = self._max_index
+        self.selected_index = index
         
         # 檢查是否需要翻頁
-        if self.selected_index // self.page_size != self.page:
-            self.page = self.selected_index // self.page_size
+        page, offset = divmod(index, self.page_size)
+        if page != self.page:
+            self.page = page
             self._refresh_display()
         else:
             control = self.control
             if control:
-                control.selectItem(self.selected_index % self.page_size)
+                control.selectItem(offset)
     
     def select_by_number(self, num: int) -> Optional[Candidate]:
         """
@@ -132,8 +169,7 @@ class CandidateListControl:
     
     def next_page(self):
         """下一頁"""
-        max_page = (len(self.candidates) - 1) // self.page_size
-        if self.page < max_page:
+        if self.page < self._max_page:
             self.page += 1
             self.selected_index = self.page * self.page_size
             self._refresh_display()
@@ -150,7 +186,7 @@ class CandidateListControl:
         """總頁數"""
         if not self.candidates:
             return 0
-        return (len(self.candidates) - 1) // self.page_size + 1
+        return self._max_page + 1
     
     @property
     def current_page(self) -> int:
@@ -178,6 +214,20 @@ class CandidateBar:
         self.window = window
         self.control_ids = control_ids
         self.candidates: List[Candidate] = []
+        
+        # 已取得的標籤控制項，於視窗建立後由 bind() 填入
+        self._controls: Optional[List[Optional[xbmcgui.Control]]] = None
+    
+    def bind(self):
+        """取得並保存標籤控制項（視窗建立後呼叫，已取得的不再重查）"""
+        controls = self._controls or [None] * len(self.control_ids)
+        for i, control_id in enumerate(self.control_ids):
+            if controls[i] is None:
+                try:
+                    controls[i] = self.window.getControl(control_id)
+                except RuntimeError:
+                    pass
+        self._controls = controls
     
     def set_candidates(self, candidates: List[Candidate]):
         """設定候選詞"""
@@ -191,17 +241,18 @@ class CandidateBar:
     
     def _refresh_display(self):
         """更新顯示"""
-        for i, control_id in enumerate(self.control_ids):
-            try:
-                control = self.window.getControl(control_id)
-                if i < len(self.candidates):
-                    control.setLabel(f"{i+1}.{self.candidates[i].phrase}")
-                    control.setVisible(True)
-                else:
-                    control.setLabel("")
-                    control.setVisible(False)
-            except:
-                pass
+        if self._controls is None or None in self._controls:
+            self.bind()
+        
+        for i, control in enumerate(self._controls):
+            if control is None:
+                continue
+            if i < len(self.candidates):
+                control.setLabel(f"{i+1}.{self.candidates[i].phrase}")
+                control.setVisible(True)
+            else:
+                control.setLabel("")
+                control.setVisible(False)
     
     def select(self, num: int) -> Optional[Candidate]:
         """選擇候選詞"""
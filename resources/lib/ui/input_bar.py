@@ -32,13 +32,31 @@ class InputBar:
         self.committed_text = ""
         self.current_zhuyin = ""
         self.state = InputState.IDLE
+        
+        # 各標籤最後一次送出的文字
+        self._last_labels = {}
+        # 已取得的控制項（找不到的下次再查）
+        self._controls = {}
     
     def _get_control(self, control_id: int) -> Optional[xbmcgui.ControlLabel]:
-        """取得控制項"""
-        try:
-            return self.window.getControl(control_id)
-        except:
-            return None
+        """取得控制項（取得後快取）"""
+        control = self._controls.get(control_id)
+        if control is None:
+            try:
+                control = self.window.getControl(control_id)
+            except RuntimeError:
+                return None
+            self._controls[control_id] = control
+        return control
+    
+    def _set_label(self, control_id: int, text: str):
+        """設定標籤文字，與上次相同時不呼叫 Kodi"""
+        if self._last_labels.get(control_id) == text:
+            return
+        control = self._get_control(control_id)
+        if control:
+            control.setLabel(text)
+            self._last_labels[control_id] = text
     
     def set_committed_text(self, text: str):
         """設定已確認的文字"""
@@ -98,29 +116,22 @@ class InputBar:
     
     def _update_text_display(self):
         """更新已確認文字顯示"""
-        control = self._get_control(self.text_control_id)
-        if control:
-            # 顯示文字，若過長則只顯示後面部分
-            display_text = self.committed_text
-            if len(display_text) > 30:
-                display_text = "..." + display_text[-27:]
-            control.setLabel(display_text)
+        # 顯示文字，若過長則只顯示後面部分
+        display_text = self.committed_text
+        if len(display_text) > 30:
+            display_text = "..." + display_text[-27:]
+        self._set_label(self.text_control_id, display_text)
     
     def _update_zhuyin_display(self):
         """更新注音顯示"""
-        control = self._get_control(self.zhuyin_control_id)
-        if control:
-            if self.current_zhuyin:
-                control.setLabel(f"[{self.current_zhuyin}]")
-            else:
-                control.setLabel("")
+        if self.current_zhuyin:
+            self._set_label(self.zhuyin_control_id, f"[{self.current_zhuyin}]")
+        else:
+            self._set_label(self.zhuyin_control_id, "")
     
     def _update_status_display(self):
         """更新狀態顯示"""
-        control = self._get_control(self.status_control_id)
-        if control:
-            status_text = self._get_status_text()
-            control.setLabel(status_text)
+        self._set_label(self.status_control_id, self._get_status_text())
     
     def _get_status_text(self) -> str:
         """取得狀態文字"""
@@ -173,13 +184,20 @@ class CompactInputBar:
         
         self.committed_text = ""
         self.current_zhuyin = ""
+        
+        # 最後一次送出的文字
+        self._last_label: Optional[str] = None
+        # 已取得的控制項（找不到的下次再查）
+        self._control: Optional[xbmcgui.ControlLabel] = None
     
     def _get_control(self) -> Optional[xbmcgui.ControlLabel]:
-        """取得控制項"""
-        try:
-            return self.window.getControl(self.control_id)
-        except:
-            return None
+        """取得控制項（取得後快取）"""
+        if self._control is None:
+            try:
+                self._control = self.window.getControl(self.control_id)
+            except RuntimeError:
+                return None
+        return self._control
     
     def update(self, committed: str = None, zhuyin: str = None):
         """
@@ -198,10 +216,6 @@ class CompactInputBar:
     
     def _refresh_display(self):
         """刷新顯示"""
-        control = self._get_control()
-        if not control:
-            return
-        
         display_text = self.committed_text
         if self.current_zhuyin:
             display_text += f" [{self.current_zhuyin}]"
@@ -213,7 +227,16 @@ class CompactInputBar:
             cut_pos = len(display_text) - max_len + 3
             display_text = "..." + display_text[cut_pos:]
         
+        # 內容未變時不呼叫 Kodi
+        if display_text == self._last_label:
+            return
+        
+        control = self._get_control()
+        if not control:
+            return
+        
         control.setLabel(display_text)
+        self._last_label = display_text
     
     def clear(self):
         """清除"""
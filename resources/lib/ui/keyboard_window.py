@@ -5,8 +5,6 @@
 
 import xbmc
 import xbmcgui
-import xbmcaddon
-import xbmcvfs
 from typing import Callable, Optional, List
 
 from ..utils.constants import (
@@ -14,6 +12,7 @@ from ..utils.constants import (
     FUNC_KEYS, InputState, SYMBOLS_FULL, SYMBOLS_HALF,
     TONE_MARKS
 )
+from ..utils.config import get_addon_path
 from ..engine import ZhuyinParser, SmartCandidateEngine, Candidate
 
 
@@ -24,6 +23,87 @@ CONTROL_KEYBOARD_GROUP = 300
 CONTROL_KEY_BASE = 1000  # 按鍵從 1000 開始
 CONTROL_STATUS_LABEL = 400
 
+# 待重繪區域（位元旗標）
+DIRTY_INPUT = 1     # 輸入列
+DIRTY_CANDS = 2     # 候選詞
+DIRTY_STATUS = 4    # 狀態列
+DIRTY_KB = 8        # 鍵盤按鍵
+DIRTY_ALL = DIRTY_INPUT | DIRTY_CANDS | DIRTY_STATUS | DIRTY_KB
+
+# 聲調符號（不含一聲空白）
+_TONE_CHARS = frozenset(TONE_MARKS[1:])
+
+# 按鍵索引 <-> 位置 / 控制項 ID 對照（版面固定，預先計算）
+_KEY_COUNT = KEYBOARD_ROWS * KEYBOARD_COLS
+_INDEX_TO_RC = tuple(divmod(i, KEYBOARD_COLS) for i in range(_KEY_COUNT))
+_RC_TO_CID = tuple(
+    tuple(CONTROL_KEY_BASE + row * KEYBOARD_COLS + col for col in range(KEYBOARD_COLS))
+    for row in range(KEYBOARD_ROWS)
+)
+
+
+def _landing_cell(row: int, col: int, row_delta: int, col_delta: int) -> tuple:
+    """模擬一次方向移動（含跳過空按鍵），回傳落點 (row, col)"""
+    new_row = (row + row_delta) % KEYBOARD_ROWS
+    new_col = (col + col_delta) % KEYBOARD_COLS
+    while KEYBOARD_LAYOUT[new_row][new_col] == '':
+        new_col = (new_col + col_delta) % KEYBOARD_COLS
+        if new_col == col:
+            break
+    return new_row, new_col
+
+
+def _build_neighbors(row_delta: int, col_delta: int) -> tuple:
+    """產生某方向每個按鍵的落點表"""
+    return tuple(
+        tuple(_landing_cell(row, col, row_delta, col_delta) for col in range(KEYBOARD_COLS))
+        for row in range(KEYBOARD_ROWS)
+    )
+
+
+# 方向移動的落點表，由 (row_delta, col_delta) 查詢
+_NEIGHBORS = {
+    delta: _build_neighbors(*delta)
+    for delta in ((0, -1), (0, 1), (-1, 0), (1, 0))
+}
+
+# Home 視窗（與背景服務共用屬性，跨行程傳遞暫停監控旗標，非空字串即為暫停）
+_HOME_WINDOW = xbmcgui.Window(10000)
+_PAUSE_MONITOR_PROPERTY = 'zhuyin.pause_monitor'
+
+# 候選詞欄位數
+_CANDIDATE_SLOTS = 9
+
+# 輸入列、狀態列與候選詞標籤
+_HOT_CONTROL_IDS = (CONTROL_INPUT_LABEL, CONTROL_STATUS_LABEL) + tuple(
+    CONTROL_CANDIDATE_LIST + i for i in range(_CANDIDATE_SLOTS)
+)
+
+
+def _build_key_labels(label_at) -> tuple:
+    """產生 (控制項 ID, 標籤) 列表，跳過功能鍵列 (最後一列)"""
+    return tuple(
+        (_RC_TO_CID[row][col], label_at(row, col))
+        for row in range(KEYBOARD_ROWS - 1)
+        for col in range(KEYBOARD_COLS)
+    )
+
+
+def _symbol_at(symbols: List[str]):
+    """依按鍵位置對應符號，超出符號表的按鍵為空白"""
+    def label_at(row: int, col: int) -> str:
+        index = row * KEYBOARD_COLS + col
+        return symbols[index] if index < len(symbols) else ""
+    return label_at
+
+
+# 各模式的按鍵標籤（版面固定，預先建立）
+_ZHUYIN_KEY_LABELS = _build_key_labels(lambda row, col: KEYBOARD_LAYOUT[row][col])
+_SYMBOL_KEY_LABELS = {
+    True: _build_key_labels(_symbol_at(SYMBOLS_FULL)),    # 全形
+    False: _build_key_labels(_symbol_at(SYMBOLS_HALF)),   # 半形
+}
+
 
 class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
     """注音鍵盤視窗"""
@@ -52,9 +132,49 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
         # 符號模式
         self.symbol_mode = False
         self.symbol_full_width = True
+        
+        # 控制項與最後一次顯示的狀態（避免重複的 getControl/setLabel）
+        self._controls = {}
+        self._last_labels = {}
+        self._last_visible = {}
+        # 最後一次顯示的候選詞欄位（None 表示尚未顯示過）
+        self._last_cands: Optional[tuple] = None
+        # 最後一次繪製鍵盤時的 (符號模式, 全形)
+        self._kb_rendered_state: Optional[tuple] = None
+        
+        # 英文輸入用的原生鍵盤（第一次使用時建立）
+        self._abc_keyboard: Optional[xbmc.Keyboard] = None
+        
+        # 待重繪區域，於事件處理結束時一次重繪
+        self._dirty = 0
+        
+        # 上次查詢候選詞時的輸入
+        self._last_cand_input: Optional[str] = None
+    
+    @property
+    def symbol_full_width(self) -> bool:
+        """是否使用全形符號"""
+        return self._symbol_full_width
+    
+    @symbol_full_width.setter
+    def symbol_full_width(self, value: bool):
+        # 同時切換目前使用的符號表與按鍵標籤
+        self._symbol_full_width = value
+        self._current_symbols = SYMBOLS_FULL if value else SYMBOLS_HALF
+        self._current_symbol_labels = _SYMBOL_KEY_LABELS[value]
     
     def onInit(self):
         """視窗初始化"""
+        # 視窗重新建立時控制項也會重建
+        self._controls.clear()
+        self._last_labels.clear()
+        self._last_visible.clear()
+        self._last_cands = None
+        self._kb_rendered_state = None
+        # 每次按鍵都會更新的標籤先解析好
+        for control_id in _HOT_CONTROL_IDS:
+            self._get_control(control_id)
+        
         self.committed_text = self.initial_text
         self._update_display()
         self._focus_key(self.key_row, self.key_col)
@@ -82,13 +202,17 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
         # 長按確認 - 送出文字
         elif action_id == xbmcgui.ACTION_SHOW_INFO:
             self._confirm_all()
+        
+        self._flush_redraw()
     
     def onClick(self, control_id):
         """處理點擊事件"""
         if control_id >= CONTROL_KEY_BASE:
             key_index = control_id - CONTROL_KEY_BASE
-            row = key_index // KEYBOARD_COLS
-            col = key_index % KEYBOARD_COLS
+            if key_index < _KEY_COUNT:
+                row, col = _INDEX_TO_RC[key_index]
+            else:
+                row, col = divmod(key_index, KEYBOARD_COLS)
             
             # 更新當前按鍵位置
             self.key_row = row
@@ -105,17 +229,16 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
             candidate_index = control_id - 200
             if candidate_index < len(self.candidates):
                 self._select_candidate(candidate_index)
+        
+        self._flush_redraw()
     
     def _move_focus(self, row_delta: int, col_delta: int):
         """移動焦點"""
-        new_row = (self.key_row + row_delta) % KEYBOARD_ROWS
-        new_col = (self.key_col + col_delta) % KEYBOARD_COLS
-        
-        # 跳過空按鍵
-        while KEYBOARD_LAYOUT[new_row][new_col] == '':
-            new_col = (new_col + col_delta) % KEYBOARD_COLS
-            if new_col == self.key_col:
-                break
+        neighbors = _NEIGHBORS.get((row_delta, col_delta))
+        if neighbors is not None:
+            new_row, new_col = neighbors[self.key_row][self.key_col]
+        else:
+            new_row, new_col = _landing_cell(self.key_row, self.key_col, row_delta, col_delta)
         
         self.key_row = new_row
         self.key_col = new_col
@@ -123,8 +246,7 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
     
     def _focus_key(self, row: int, col: int):
         """設定焦點到指定按鍵"""
-        control_id = CONTROL_KEY_BASE + row * KEYBOARD_COLS + col
-        self.setFocusId(control_id)
+        self.setFocusId(_RC_TO_CID[row][col])
     
     def _on_key_press(self):
         """處理按鍵按下"""
@@ -155,21 +277,25 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
     def _on_abc(self):
         """切換到英文輸入 (呼叫原生鍵盤)"""
         # 暫停背景服務監控，避免原生鍵盤一開又被注音鍵盤蓋住
-        xbmcgui.Window(10000).setProperty('zhuyin.pause_monitor', 'true')
+        _HOME_WINDOW.setProperty(_PAUSE_MONITOR_PROPERTY, '1')
         
-        # 呼叫原生鍵盤，傳入當前已確認的文字
-        keyboard = xbmc.Keyboard(self.committed_text, "English Input")
+        # 呼叫原生鍵盤，傳入當前已確認的文字（重複使用同一個實例）
+        keyboard = self._abc_keyboard
+        if keyboard is None:
+            keyboard = self._abc_keyboard = xbmc.Keyboard(self.committed_text, "English Input")
+        else:
+            keyboard.setDefault(self.committed_text)
         keyboard.doModal()
         
         # 恢復監控
-        xbmcgui.Window(10000).clearProperty('zhuyin.pause_monitor')
+        _HOME_WINDOW.clearProperty(_PAUSE_MONITOR_PROPERTY)
         
         if keyboard.isConfirmed():
             # 更新文字
             new_text = keyboard.getText()
             if new_text:
                 self.committed_text = new_text
-                self._update_display()
+                self._mark_dirty(DIRTY_INPUT)
     
     def _input_zhuyin(self, char: str):
         """輸入注音符號"""
@@ -178,16 +304,18 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
             self._input_symbol(char)
             return
         
+        prev_candidates, prev_state = self.candidates, self.state
+        
         self.current_input += char
         self.state = InputState.COMPOSING
         
         # 如果是聲調，嘗試完成音節
-        if char in TONE_MARKS[1:]:
+        if char in _TONE_CHARS:
             self._complete_syllable()
         else:
             self._update_candidates()
         
-        self._update_display()
+        self._mark_dirty(self._changed_regions(prev_candidates, prev_state))
     
     def _complete_syllable(self):
         """完成當前音節，進入選字"""
@@ -208,7 +336,7 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
         else:
             # 待機狀態：輸入空格
             self.committed_text += ' '
-            self._update_display()
+            self._mark_dirty(DIRTY_INPUT)
     
     def _select_candidate(self, index: int):
         """選擇候選詞"""
@@ -226,50 +354,68 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
         # 清除當前輸入
         self.current_input = ""
         self.candidates = []
+        self._last_cand_input = None
         self.state = InputState.IDLE
         
-        self._update_display()
+        self._mark_dirty(DIRTY_INPUT | DIRTY_CANDS | DIRTY_STATUS)
     
     def _update_candidates(self):
         """更新候選詞列表"""
         if not self.current_input:
             self.candidates = []
+            self._last_cand_input = None
+            return
+        
+        # 輸入未變時沿用目前的候選詞，不再查詢引擎
+        if self.current_input == self._last_cand_input and self.candidates:
             return
         
         self.candidates = self.engine.get_candidates_smart(self.current_input)
+        self._last_cand_input = self.current_input
     
     def _delete_last(self):
         """刪除最後一個輸入"""
         if self.current_input:
+            prev_candidates, prev_state = self.candidates, self.state
+            
             self.current_input = self.current_input[:-1]
             if self.current_input:
                 self._update_candidates()
             else:
                 self.candidates = []
                 self.state = InputState.IDLE
-            self._update_display()
+            self._mark_dirty(self._changed_regions(prev_candidates, prev_state))
+    
+    def _changed_regions(self, prev_candidates: List[Candidate], prev_state) -> int:
+        """輸入列一定重繪；候選詞與狀態只在與操作前不同時重繪"""
+        flags = DIRTY_INPUT
+        if self.candidates != prev_candidates:
+            flags |= DIRTY_CANDS
+        if self.state != prev_state:
+            flags |= DIRTY_STATUS
+        return flags
     
     def _delete_last_committed(self):
         """刪除最後一個已確認的字"""
         if self.committed_text:
             self.committed_text = self.committed_text[:-1]
-            self._update_display()
+            self._mark_dirty(DIRTY_INPUT)
     
     def _toggle_symbol_mode(self):
         """切換符號模式"""
         self.symbol_mode = not self.symbol_mode
-        self._update_keyboard_display()
+        self._mark_dirty(DIRTY_KB | DIRTY_STATUS)
     
     def _input_symbol(self, key: str):
         """輸入符號"""
         # 在符號模式下，按鍵對應符號
-        symbols = SYMBOLS_FULL if self.symbol_full_width else SYMBOLS_HALF
+        symbols = self._current_symbols
         
         # 簡單映射：使用位置對應
         key_index = self.key_row * KEYBOARD_COLS + self.key_col
         if key_index < len(symbols):
             self.committed_text += symbols[key_index]
-            self._update_display()
+            self._mark_dirty(DIRTY_INPUT)
     
     def _confirm_all(self):
         """確認所有輸入並關閉"""
@@ -282,90 +428,151 @@ class ZhuyinKeyboardWindow(xbmcgui.WindowXMLDialog):
             self.callback(self.committed_text)
         
         # 結束學習 session
-        # SmartCandidateEngine 繼承自 CandidateEngine，沒有 .engine 屬性
-        # 應該直接呼叫 self.engine.end_session() 如果有的話，或者透過 user_db
-        # 這裡假設 SmartCandidateEngine 應該要有 end_session 方法，或者我們需要實作它
-        if hasattr(self.engine, 'end_session'):
-            self.engine.end_session()
+        self.engine.end_session()
         
+        self._cancel_redraw()
         self.close()
     
     def _cancel(self):
         """取消輸入"""
         if self.callback:
             self.callback(None)
+        
+        # 取消時已選的字詞仍需保存
+        self.engine.end_session()
+        
+        self._cancel_redraw()
         self.close()
     
+    def _mark_dirty(self, flags: int):
+        """標記待重繪區域（由 onAction/onClick 結束時的 _flush_redraw 一次重繪）"""
+        self._dirty |= flags
+    
+    def _cancel_redraw(self):
+        """捨棄尚未執行的重繪（視窗關閉前呼叫）"""
+        self._dirty = 0
+    
+    def _flush_redraw(self):
+        """執行累積的重繪，只更新被標記的區域（在 GUI 事件執行緒上呼叫）"""
+        flags = self._dirty
+        if not flags:
+            return
+        self._dirty = 0
+        
+        try:
+            if flags & DIRTY_INPUT:
+                self._update_input_display()
+            if flags & DIRTY_CANDS:
+                self._update_candidate_display()
+            if flags & DIRTY_STATUS:
+                self._update_status_display()
+            if flags & DIRTY_KB:
+                self._update_keyboard_display()
+        except RuntimeError:
+            # 視窗已關閉
+            pass
+    
+    def _get_control(self, control_id: int):
+        """取得控制項（取得後快取），找不到時回傳 None，下次再查"""
+        control = self._controls.get(control_id)
+        if control is None:
+            try:
+                control = self.getControl(control_id)
+            except RuntimeError:
+                return None
+            self._controls[control_id] = control
+        return control
+    
+    def _set_label(self, control_id: int, label: str):
+        """設定標籤文字，與上次相同時略過"""
+        if self._last_labels.get(control_id) == label:
+            return
+        control = self._get_control(control_id)
+        if control is not None:
+            control.setLabel(label)
+            self._last_labels[control_id] = label
+    
+    def _set_visible(self, control_id: int, visible: bool):
+        """設定可見狀態，與上次相同時略過"""
+        if self._last_visible.get(control_id) == visible:
+            return
+        control = self._get_control(control_id)
+        if control is not None:
+            control.setVisible(visible)
+            self._last_visible[control_id] = visible
+    
     def _update_display(self):
         """更新顯示"""
         # 更新輸入列
-        input_label = self.getControl(CONTROL_INPUT_LABEL)
-        if input_label:
-            display_text = self.committed_text
-            if self.current_input:
-                display_text += f"[{self.current_input}]"
-            input_label.setLabel(display_text)
+        self._update_input_display()
         
         # 更新候選詞
         self._update_candidate_display()
         
         # 更新狀態
-        status_label = self.getControl(CONTROL_STATUS_LABEL)
-        if status_label:
-            status_text = self._get_status_text()
-            status_label.setLabel(status_text)
+        self._update_status_display()
+    
+    def _update_input_display(self):
+        """更新輸入列"""
+        display_text = self.committed_text
+        if self.current_input:
+            display_text += f"[{self.current_input}]"
+        self._set_label(CONTROL_INPUT_LABEL, display_text)
+    
+    def _update_status_display(self):
+        """更新狀態列"""
+        self._set_label(CONTROL_STATUS_LABEL, self._get_status_text())
     
     def _update_candidate_display(self):
-        """更新候選詞顯示"""
-        for i in range(9):
-            control_id = 200 + i
-            try:
-                control = self.getControl(control_id)
-                if i < len(self.candidates):
-                    control.setLabel(f"{i+1}.{self.candidates[i].phrase}")
-                    control.setVisible(True)
-                else:
-                    control.setLabel("")
-                    control.setVisible(False)
-            except:
-                pass
+        """更新候選詞顯示（只更新與上次不同的欄位）"""
+        shown = [c.phrase for c in self.candidates[:_CANDIDATE_SLOTS]]
+        shown += [""] * (_CANDIDATE_SLOTS - len(shown))
+        shown = tuple(shown)
+        
+        last = self._last_cands
+        if shown == last:
+            return
+        if last is None:
+            last = (None,) * _CANDIDATE_SLOTS
+        
+        written = list(shown)
+        for i, phrase in enumerate(shown):
+            if phrase == last[i]:
+                continue
+            control_id = CONTROL_CANDIDATE_LIST + i
+            if self._get_control(control_id) is None:
+                # 找不到控制項時不記錄，下次重繪再試
+                written[i] = None
+                continue
+            if phrase:
+                self._set_label(control_id, f"{i+1}.{phrase}")
+                self._set_visible(control_id, True)
+            else:
+                self._set_label(control_id, "")
+                self._set_visible(control_id, False)
+        
+        self._last_cands = tuple(written)
     
     def _update_keyboard_display(self):
         """更新鍵盤顯示（符號模式切換）"""
-        symbols = SYMBOLS_FULL if self.symbol_full_width else SYMBOLS_HALF
-        
-        for row in range(KEYBOARD_ROWS):
-            for col in range(KEYBOARD_COLS):
-                # 跳過功能鍵列 (最後一列)
-                if row == KEYBOARD_ROWS - 1:
-                    continue
-                    
-                control_id = CONTROL_KEY_BASE + row * KEYBOARD_COLS + col
-                try:
-                    button = self.getControl(control_id)
-                    if self.symbol_mode:
-                        # 計算符號索引
-                        index = row * KEYBOARD_COLS + col
-                        if index < len(symbols):
-                            button.setLabel(symbols[index])
-                        else:
-                            button.setLabel("")
-                    else:
-                        # 還原注音符號
-                        char = KEYBOARD_LAYOUT[row][col]
-                        button.setLabel(char)
-                except:
-                    pass
-        
-        # 更新功能鍵標籤
-        try:
-            symbol_btn = self.getControl(CONTROL_KEY_BASE + 40) # 符號鍵
-            if self.symbol_mode:
-                symbol_btn.setLabel("注音")
-            else:
-                symbol_btn.setLabel("符號")
-        except:
-            pass
+        # 模式與全形設定都沒變時不需重畫
+        state = (self.symbol_mode, self.symbol_full_width)
+        if state == self._kb_rendered_state:
+            return
+        
+        if self.symbol_mode:
+            key_labels = self._current_symbol_labels
+        else:
+            key_labels = _ZHUYIN_KEY_LABELS
+        
+        # 標籤未改變的按鍵由 _set_label 略過
+        for control_id, label in key_labels:
+            self._set_label(control_id, label)
+        
+        # 更新功能鍵標籤（符號鍵）
+        self._set_label(CONTROL_KEY_BASE + 40, "注音" if self.symbol_mode else "符號")
+        
+        self._kb_rendered_state = state
     
     def _get_status_text(self) -> str:
         """取得狀態文字"""
@@ -391,8 +598,7 @@ def show_zhuyin_keyboard(callback: Callable[[str], None] = None,
     Returns:
         輸入的文字（無回調時）
     """
-    addon = xbmcaddon.Addon()
-    addon_path = xbmcvfs.translatePath(addon.getAddonInfo('path'))
+    addon_path = get_addon_path()
     
     result = [None]
     
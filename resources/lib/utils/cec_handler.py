@@ -3,12 +3,24 @@
 CEC 按鍵處理 - 處理 HDMI-CEC 遙控器按鍵
 """
 
+import time
 import xbmc
 import xbmcgui
 from typing import Dict, Callable, Optional
 from .constants import CEC_KEYS
 
 
+# ACTION_LUT 中的按鍵種類
+_KIND_KEY = 0       # 一般按鍵，值為按鍵名稱
+_KIND_NUMBER = 1    # 數字鍵，值為數字
+_KIND_COLOR = 2     # 顏色鍵，值為顏色名稱
+
+# 長按判斷結果
+_PRESS_NORMAL = 0   # 一般按壓（或尚未達到長按的重複動作）
+_PRESS_LONG = 1     # 剛達到長按
+_PRESS_HELD = 2     # 長按已觸發後的重複動作
+
+
 class CECHandler:
     """CEC 按鍵處理器"""
     
@@ -49,16 +61,27 @@ class CECHandler:
         xbmcgui.ACTION_TELETEXT_BLUE: 'blue',
     }
     
+    # 按住超過此秒數視為長按
+    LONG_PRESS_TIME = 0.4
+    # 同一按鍵兩次動作間隔超過此秒數，視為重新按下而非按住
+    REPEAT_GAP = 0.6
+    
+    # 動作 ID -> (種類, 值)，handle_action 每次只需查一次表
+    ACTION_LUT = {action_id: (_KIND_KEY, name) for action_id, name in ACTION_MAP.items()}
+    ACTION_LUT.update({action_id: (_KIND_NUMBER, num) for action_id, num in NUMBER_ACTIONS.items()})
+    ACTION_LUT.update({action_id: (_KIND_COLOR, color) for action_id, color in COLOR_ACTIONS.items()})
+    
     def __init__(self):
         """初始化 CEC 處理器"""
         self.callbacks: Dict[str, Callable] = {}
         self.number_callback: Optional[Callable[[int], None]] = None
         self.long_press_callback: Optional[Callable[[str], None]] = None
         
-        # 長按檢測
-        self._last_action = None
-        self._press_count = 0
-        self._long_press_threshold = 3
+        # 長按檢測（依同一按鍵連續重複送出的時間判斷）
+        self._press_action: Optional[int] = None
+        self._press_start = 0.0
+        self._press_last = 0.0
+        self._long_press_fired = False
     
     def register_callback(self, key: str, callback: Callable):
         """
@@ -90,45 +113,68 @@ class CECHandler:
         """
         action_id = action.getId()
         
-        # 檢查長按
-        if action_id == self._last_action:
-            self._press_count += 1
-            if self._press_count >= self._long_press_threshold:
-                if self.long_press_callback:
-                    key_name = self._get_key_name(action_id)
-                    if key_name:
-                        self.long_press_callback(key_name)
-                        self._press_count = 0
-                        return True
-        else:
-            self._last_action = action_id
-            self._press_count = 1
+        # Kodi 會在重複按鍵之間插入 NOOP，不可中斷長按判斷
+        if action_id == xbmcgui.ACTION_NOOP:
+            return False
+        
+        entry = self.ACTION_LUT.get(action_id)
+        
+        # 檢查長按（只對一般按鍵，未註冊回調時不計時）
+        if self.long_press_callback:
+            if entry is not None and entry[0] == _KIND_KEY:
+                press = self._detect_long_press(action_id)
+                if press == _PRESS_LONG:
+                    self.long_press_callback(entry[1])
+                    return True
+                if press == _PRESS_HELD:
+                    # 長按已觸發，吞掉同一次按住的後續重複動作
+                    return True
+            else:
+                self._press_action = None
+        
+        if entry is None:
+            return False
+        
+        kind, value = entry
         
         # 處理數字鍵
-        if action_id in self.NUMBER_ACTIONS:
-            num = self.NUMBER_ACTIONS[action_id]
+        if kind == _KIND_NUMBER:
             if self.number_callback:
-                self.number_callback(num)
+                self.number_callback(value)
                 return True
+            return False
         
-        # 處理一般按鍵
-        key_name = self._get_key_name(action_id)
-        if key_name and key_name in self.callbacks:
-            self.callbacks[key_name]()
+        # 處理一般按鍵與顏色鍵
+        callback = self.callbacks.get(value)
+        if callback is not None:
+            callback()
             return True
         
-        # 處理顏色鍵
-        if action_id in self.COLOR_ACTIONS:
-            color = self.COLOR_ACTIONS[action_id]
-            if color in self.callbacks:
-                self.callbacks[color]()
-                return True
-        
         return False
     
-    def _get_key_name(self, action_id: int) -> Optional[str]:
-        """取得按鍵名稱"""
-        return self.ACTION_MAP.get(action_id)
+    def _detect_long_press(self, action_id: int) -> int:
+        """
+        記錄按鍵動作並判斷是否達到長按
+        
+        每次按住只會觸發一次；觸發前的重複動作照常處理，
+        觸發後同一次按住的重複動作回傳 _PRESS_HELD。
+        """
+        now = time.monotonic()
+        result = _PRESS_NORMAL
+        
+        if action_id != self._press_action or now - self._press_last > self.REPEAT_GAP:
+            # 新的按壓
+            self._press_action = action_id
+            self._press_start = now
+            self._long_press_fired = False
+        elif self._long_press_fired:
+            result = _PRESS_HELD
+        elif now - self._press_start >= self.LONG_PRESS_TIME:
+            self._long_press_fired = True
+            result = _PRESS_LONG
+        
+        self._press_last = now
+        return result
     
     def clear_callbacks(self):
         """清除所有回調"""
@@ -156,6 +202,28 @@ class KeyboardNavigation:
         
         self.current_row = 0
         self.current_col = 0
+        
+        # 各方向跳過無效格子後的落點（版面固定，預先計算）
+        # 水平方向以 [row][col] 查欄，垂直方向以 [col][row] 查列
+        self._skip_right = [[self._skip_from(r, c, 0, 1)[1] for c in range(cols)] for r in range(rows)]
+        self._skip_left = [[self._skip_from(r, c, 0, -1)[1] for c in range(cols)] for r in range(rows)]
+        self._skip_down = [[self._skip_from(r, c, 1, 0)[0] for r in range(rows)] for c in range(cols)]
+        self._skip_up = [[self._skip_from(r, c, -1, 0)[0] for r in range(rows)] for c in range(cols)]
+    
+    def _skip_from(self, row: int, col: int, row_step: int, col_step: int) -> tuple:
+        """從 (row, col) 沿移動方向跳過無效格子，回傳落點"""
+        attempts = 0
+        while (row, col) in self.skip_cells:
+            if col_step != 0:
+                col = (col + col_step) % self.cols
+            else:
+                row = (row + row_step) % self.rows
+            
+            attempts += 1
+            if attempts > self.rows * self.cols:
+                break
+        
+        return (row, col)
     
     def move(self, row_delta: int, col_delta: int) -> tuple:
         """
@@ -177,17 +245,15 @@ class KeyboardNavigation:
         if col_delta != 0:
             new_col = (self.current_col + col_delta) % self.cols
         
-        # 跳過無效格子
-        attempts = 0
-        while (new_row, new_col) in self.skip_cells:
-            if col_delta != 0:
-                new_col = (new_col + (1 if col_delta > 0 else -1)) % self.cols
-            elif row_delta != 0:
-                new_row = (new_row + (1 if row_delta > 0 else -1)) % self.rows
-            
-            attempts += 1
-            if attempts > self.rows * self.cols:
-                break
+        # 跳過無效格子（查表）
+        if col_delta > 0:
+            new_col = self._skip_right[new_row][new_col]
+        elif col_delta < 0:
+            new_col = self._skip_left[new_row][new_col]
+        elif row_delta > 0:
+            new_row = self._skip_down[new_col][new_row]
+        elif row_delta < 0:
+            new_row = self._skip_up[new_col][new_row]
         
         self.current_row = new_row
         self.current_col = new_col
@@ -3,8 +3,82 @@
 設定管理 - 管理插件設定
 """
 
+from functools import lru_cache, partial
+import xbmc
 import xbmcaddon
-from typing import Any, Optional
+import xbmcgui
+import xbmcvfs
+from typing import Any, Callable, Optional
+
+
+# 共用的 Addon 實例（建立成本高，只在設定變更後重建）
+_addon: Optional[xbmcaddon.Addon] = None
+
+
+# 背景服務把設定發布到 Home 視窗屬性，腳本端直接讀屬性（不必讀取 settings.xml）
+SETTING_PROPERTY_PREFIX = 'zhuyin.setting.'
+_SETTINGS_PUBLISHED = 'zhuyin.settings_published'  # 非空字串即為已發布
+_HOME_WINDOW = xbmcgui.Window(10000)
+
+
+def _settings_published() -> bool:
+    """背景服務是否已發布設定"""
+    return bool(_HOME_WINDOW.getProperty(_SETTINGS_PUBLISHED))
+
+
+def _get_addon() -> xbmcaddon.Addon:
+    """取得共用的 Addon 實例"""
+    global _addon
+    if _addon is None:
+        _addon = xbmcaddon.Addon()
+    return _addon
+
+
+def _to_bool(value: str) -> bool:
+    return value.lower() == 'true'
+
+
+def _to_int(value: str, default: int) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _to_str(value: str) -> str:
+    return value
+
+
+def _converter_for(default: Any) -> Callable[[str], Any]:
+    """依預設值的型別決定設定字串的轉換方式"""
+    if isinstance(default, bool):
+        return _to_bool
+    if isinstance(default, int):
+        return partial(_to_int, default=default)
+    return _to_str
+
+
+@lru_cache(maxsize=None)
+def get_addon_path() -> str:
+    """插件安裝目錄（執行期間不變，只查詢一次）"""
+    return xbmcvfs.translatePath(_get_addon().getAddonInfo('path'))
+
+
+@lru_cache(maxsize=None)
+def get_profile_path() -> str:
+    """插件使用者資料目錄（執行期間不變，只查詢一次）"""
+    return xbmcvfs.translatePath(_get_addon().getAddonInfo('profile'))
+
+
+class _SettingsMonitor(xbmc.Monitor):
+    """設定變更時讓 Config 重新讀取"""
+    
+    def __init__(self, config: 'Config'):
+        super().__init__()
+        self._config = config
+    
+    def onSettingsChanged(self):
+        self._config.reload()
 
 
 class Config:
@@ -32,10 +106,33 @@ class Config:
         KEY_HOTKEY: 'info',
     }
     
+    # 各設定鍵的轉換函式（由預設值型別預先決定）
+    _CONVERTERS = {key: _converter_for(value) for key, value in DEFAULTS.items()}
+    
     def __init__(self):
         """初始化設定管理"""
-        self._addon = xbmcaddon.Addon()
         self._cache = {}
+        self._monitor = _SettingsMonitor(self)
+        # 背景服務已發布設定時改讀 Home 視窗屬性
+        self._use_published = _settings_published()
+        
+        # 一次讀入所有已知設定
+        self._prefetch()
+    
+    @property
+    def _addon(self) -> xbmcaddon.Addon:
+        return _get_addon()
+    
+    def _raw_setting(self, key: str) -> str:
+        """讀取設定字串（已知設定優先讀背景服務發布的屬性）"""
+        if self._use_published and key in self.DEFAULTS:
+            return _HOME_WINDOW.getProperty(SETTING_PROPERTY_PREFIX + key)
+        return self._addon.getSetting(key)
+    
+    def _prefetch(self):
+        """預先讀取 DEFAULTS 中的所有設定"""
+        for key in self.DEFAULTS:
+            self.get(key)
     
     def get(self, key: str, default: Any = None) -> Any:
         """
@@ -52,19 +149,17 @@ class Config:
             return self._cache[key]
         
         try:
-            value = self._addon.getSetting(key)
-            
-            # 類型轉換
-            default_value = default or self.DEFAULTS.get(key)
-            if isinstance(default_value, bool):
-                value = value.lower() == 'true'
-            elif isinstance(default_value, int):
-                value = int(value) if value else default_value
+            # 類型轉換（有指定 default 時依其型別）
+            if default:
+                convert = _converter_for(default)
+            else:
+                convert = self._CONVERTERS.get(key, _to_str)
+            value = convert(self._raw_setting(key))
             
             self._cache[key] = value
             return value
             
-        except:
+        except (RuntimeError, ValueError):
             return default or self.DEFAULTS.get(key)
     
     def set(self, key: str, value: Any):
@@ -81,6 +176,8 @@ class Config:
             str_value = str(value)
         
         self._addon.setSetting(key, str_value)
+        if self._use_published and key in self.DEFAULTS:
+            _HOME_WINDOW.setProperty(SETTING_PROPERTY_PREFIX + key, str_value)
         self._cache[key] = value
     
     def get_int(self, key: str, default: int = 0) -> int:
@@ -138,11 +235,34 @@ class Config:
         """清除快取"""
         self._cache.clear()
     
+    def reload(self):
+        """設定變更後重建 Addon 實例並重新讀取設定"""
+        global _addon
+        _addon = None
+        # 背景服務可能尚未重新發布，這次直接讀 Addon 設定
+        self._use_published = False
+        self.clear_cache()
+        self._prefetch()
+        # 之後的讀寫依背景服務目前的發布狀態
+        self._use_published = _settings_published()
+    
     def open_settings(self):
         """開啟設定畫面"""
         self._addon.openSettings()
 
 
+def publish_settings(addon: xbmcaddon.Addon):
+    """將所有已知設定寫入 Home 視窗屬性（由背景服務於啟動及設定變更時呼叫）"""
+    for key in Config.DEFAULTS:
+        _HOME_WINDOW.setProperty(SETTING_PROPERTY_PREFIX + key, addon.getSetting(key))
+    _HOME_WINDOW.setProperty(_SETTINGS_PUBLISHED, '1')
+
+
+def withdraw_settings():
+    """背景服務結束時撤回已發布的設定，腳本端改回直接讀取"""
+    _HOME_WINDOW.clearProperty(_SETTINGS_PUBLISHED)
+
+
 # 全域設定實例
 _config_instance: Optional[Config] = None
 
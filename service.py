@@ -2,20 +2,52 @@
 # -*- coding: utf-8 -*-
 """
 Kodi 注音輸入法 - 背景服務
-監聽快捷鍵以啟動輸入法
+監聽原生鍵盤開啟通知與快捷鍵以啟動輸入法
 """
 
+import sys
+import time
 import xbmc
 import xbmcaddon
 import xbmcgui
+import xbmcvfs
 
 ADDON = xbmcaddon.Addon()
 ADDON_ID = ADDON.getAddonInfo('id')
 
+# 將 lib 加入路徑
+ADDON_PATH = xbmcvfs.translatePath(ADDON.getAddonInfo('path'))
+sys.path.insert(0, ADDON_PATH)
+
+from resources.lib.utils.config import publish_settings, withdraw_settings
+
+HOME_WINDOW = xbmcgui.Window(10000)
+LOG_PREFIX = f"[{ADDON_ID}] "
+
+# 啟動輸入法的 builtin 指令
+LAUNCH_BUILTIN = f'RunScript({ADDON_ID})'
+OVERLAY_BUILTIN = f'RunScript({ADDON_ID}, mode=overlay)'
+
+# 原生鍵盤開啟且注音鍵盤 (10147) 未開啟，一次查詢
+NATIVE_KEYBOARD_ONLY = 'Window.IsActive(virtualkeyboard) + !Window.IsActive(10147)'
+
+# 暫停監控旗標，由注音鍵盤設定（非空字串即為暫停）
+PAUSE_MONITOR_PROPERTY = sys.intern('zhuyin.pause_monitor')
+
+# 服務執行中的標記（避免重複啟動多個服務實例）
+SERVICE_RUNNING_PROPERTY = 'zhuyin.service.running'
+
+# 監聽的通知 method
+METHOD_INPUT_REQUESTED = sys.intern('Input.OnInputRequested')
+METHOD_ZHUYIN_INPUT = sys.intern('Other.ZhuyinInput')
+
+# 啟動 Overlay 後的防重複啟動時間（秒）
+LAUNCH_DEBOUNCE = 1.0
+
 
 def log(message: str, level: int = xbmc.LOGINFO):
-    """記錄日誌"""
-    xbmc.log(f"[{ADDON_ID}] {message}", level)
+    """記錄日誌（等級過濾由 Kodi 處理）"""
+    xbmc.log(LOG_PREFIX + message, level)
 
 
 class ZhuyinService(xbmc.Monitor):
@@ -23,62 +55,88 @@ class ZhuyinService(xbmc.Monitor):
     
     def __init__(self):
         super().__init__()
-        self.running = True
+        self._last_launch = 0.0
+        # 通知 method -> 處理函式
+        self._handlers = {
+            METHOD_INPUT_REQUESTED: self._on_input_requested,
+            METHOD_ZHUYIN_INPUT: self._on_zhuyin_input,
+        }
+        # 發布設定供輸入法視窗讀取
+        publish_settings(ADDON)
         log("注音輸入法服務啟動")
     
     def onSettingsChanged(self):
         """設定變更時"""
         log("設定已變更")
-        # 重新載入設定
-        ADDON.clearSettings()
+        # 以新的 Addon 實例讀取變更後的設定並重新發布
+        publish_settings(xbmcaddon.Addon())
     
     def onNotification(self, sender: str, method: str, data: str):
         """
         處理通知
         
-        可以監聽自訂通知來啟動輸入法
+        Input.OnInputRequested: 原生鍵盤開啟，改以注音鍵盤取代
+        Other.ZhuyinInput: 自訂通知，直接啟動輸入法
         """
-        if method == 'Other.ZhuyinInput':
-            log("收到啟動輸入法通知")
-            self._launch_keyboard()
+        handler = self._handlers.get(method)
+        if handler is not None:
+            # 只記錄會處理的通知，其他通知不產生任何日誌
+            log(f"收到通知 {method} ({sender})", xbmc.LOGDEBUG)
+            handler()
+    
+    def _on_zhuyin_input(self):
+        """自訂通知：直接啟動輸入法"""
+        log("收到啟動輸入法通知")
+        self._launch_keyboard()
+    
+    def _on_input_requested(self):
+        """原生鍵盤開啟：改以注音鍵盤 (Overlay 模式) 取代"""
+        # 先檢查是否暫停監控 (由注音鍵盤在開啟英文輸入時設定，避免無限迴圈)
+        # 暫停中不必再查詢視窗狀態
+        if HOME_WINDOW.getProperty(PAUSE_MONITOR_PROPERTY):
+            return
+        
+        # 如果原生鍵盤開啟，且我們的鍵盤未開啟，則啟動我們的鍵盤
+        # 注意：WindowXMLDialog 的 ID 必須與 XML 中的 ID 一致 (10147)
+        if not xbmc.getCondVisibility(NATIVE_KEYBOARD_ONLY):
+            return
+        
+        # 剛啟動過則略過，避免重複開啟
+        now = time.monotonic()
+        if now - self._last_launch < LAUNCH_DEBOUNCE:
+            return
+        
+        # 使用 RunScript 啟動，確保使用正確的 ID
+        xbmc.executebuiltin(OVERLAY_BUILTIN)
+        self._last_launch = now
     
     def _launch_keyboard(self):
         """啟動輸入法"""
-        xbmc.executebuiltin(f'RunScript({ADDON_ID})')
+        xbmc.executebuiltin(LAUNCH_BUILTIN)
     
     def run(self):
         """服務主迴圈"""
-        # 服務保持運行
-        while self.running and not self.abortRequested():
-            # 監控原生鍵盤是否開啟
-            # 如果原生鍵盤開啟，且我們的鍵盤未開啟，則啟動我們的鍵盤
-            # 增加檢查：如果原生鍵盤標題是 "English Input"，則不啟動注音鍵盤 (避免無限迴圈)
-            if xbmc.getCondVisibility('Window.IsActive(virtualkeyboard)') and \
-               not xbmc.getCondVisibility('Window.IsActive(10147)'):
-                
-                # 檢查是否暫停監控 (由注音鍵盤設定)
-                if xbmcgui.Window(10000).getProperty('zhuyin.pause_monitor') == 'true':
-                    xbmc.sleep(500)
-                    continue
-
-                # 啟動注音輸入法 (Overlay 模式)
-                # 使用 RunScript 啟動，確保使用正確的 ID
-                # 注意：WindowXMLDialog 的 ID 必須與 XML 中的 ID 一致 (10147)
-                xbmc.executebuiltin(f'RunScript({ADDON_ID}, mode=overlay)')
-                
-                # 等待一下避免重複啟動
-                xbmc.sleep(1000)
-            
-            if self.waitForAbort(0.5):
-                break
+        # 原生鍵盤的偵測由 onNotification 處理，主執行緒只需等待結束
+        # waitForAbort 在 Kodi 要求結束時立即返回
+        self.waitForAbort()
         
+        withdraw_settings()
         log("注音輸入法服務結束")
 
 
 def main():
     """服務入口"""
-    service = ZhuyinService()
-    service.run()
+    # 已有服務實例在執行時不再建立第二個 Monitor
+    if HOME_WINDOW.getProperty(SERVICE_RUNNING_PROPERTY):
+        log("注音輸入法服務已在執行，略過")
+        return
+    
+    HOME_WINDOW.setProperty(SERVICE_RUNNING_PROPERTY, '1')
+    try:
+        service = ZhuyinService()
+        service.run()
+    finally:
+        HOME_WINDOW.clearProperty(SERVICE_RUNNING_PROPERTY)
 
 
 if __name__ == '__main__':